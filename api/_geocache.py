@@ -0,0 +1,122 @@
+"""Geocode result cache for the lookup functions.
+
+Repeat lookups of the same address (profile edits, retried signups) skip the
+Nominatim round-trip. What's cached is deliberately thin so the "street is
+never persisted" promise in lookup-districts.py still holds:
+
+- the key is sha256(salt + normalized address); the address itself is never
+  stored, in memory or on disk
+- the value is only the resolved (lat, lon)
+
+An in-process LRU with a TTL always sits in front. Setting GEOCODE_CACHE_DB
+to a file path (e.g. /tmp/otp-geocode.sqlite on Vercel) adds a SQLite layer
+behind it that survives container restarts on the same host. That layer is
+only enabled together with GEOCODE_CACHE_SALT: with no configured salt each
+process draws a random one, so on-disk keys could never be matched anyway.
+
+Env:
+    GEOCODE_CACHE_SALT   secret salt for the key hash (keep it out of git)
+    GEOCODE_CACHE_DB     optional SQLite path
+    GEOCODE_CACHE_SIZE   in-process entries (default 2048)
+    GEOCODE_CACHE_TTL    seconds an entry stays valid (default 30 days)
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_SIZE = 2048
+DEFAULT_TTL = 30 * 24 * 3600
+
+
+def normalize_address(street, city, state, zip_code):
+    """Case, punctuation and whitespace-insensitive form of an address."""
+    parts = [street, city, state, str(zip_code or "")[:5]]   # JSON clients may send the ZIP as a number
+    return "|".join(re.sub(r"\s+", " ", re.sub(r"[.,#]", " ", str(p or ""))).strip().lower() for p in parts)
+
+
+class GeocodeCache:
+    def __init__(self, salt=None, maxsize=DEFAULT_SIZE, ttl=DEFAULT_TTL, db_path=None):
+        self._salt = (salt or os.urandom(16).hex()).encode("utf-8")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._mem = OrderedDict()   # key -> (lat, lon, expires_at)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.db_hits = 0
+        self._db = None
+        if db_path and salt:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "create table if not exists geocode "
+                "(key text primary key, lat real not null, lon real not null, expires_at real not null)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            salt=os.environ.get("GEOCODE_CACHE_SALT"),
+            maxsize=int(os.environ.get("GEOCODE_CACHE_SIZE", DEFAULT_SIZE)),
+            ttl=float(os.environ.get("GEOCODE_CACHE_TTL", DEFAULT_TTL)),
+            db_path=os.environ.get("GEOCODE_CACHE_DB"),
+        )
+
+    def key(self, street, city, state, zip_code):
+        text = normalize_address(street, city, state, zip_code)
+        return hashlib.sha256(self._salt + text.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """(lat, lon) for a key, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry and entry[2] > now:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1]
+            if entry:
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "select lat, lon, expires_at from geocode where key = ? and expires_at > ?", (key, now)
+                ).fetchone()
+                if row:
+                    self._remember(key, *row)
+                    self.hits += 1
+                    self.db_hits += 1
+                    return row[0], row[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, lat, lon):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, lat, lon, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "insert or replace into geocode (key, lat, lon, expires_at) values (?, ?, ?, ?)",
+                    (key, lat, lon, expires_at),
+                )
+                self._db.commit()
+
+    def _remember(self, key, lat, lon, expires_at):
+        self._mem[key] = (lat, lon, expires_at)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "db_hits": self.db_hits,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "entries": len(self._mem),
+                "persistent": self._db is not None,
+            }
@@ -0,0 +1,276 @@
+"""Geocoders for the lookup functions.
+
+Every geocoder has the same interface:
+    geocode(street, city, state, zip_code) -> (lat, lon), or None if not found
+and raises GeocodeError when it can't give an answer at all.
+from_env() builds the chain the handlers use: the offline TIGER address-range
+index (districts/address_index.py) when it has been built, then Nominatim for
+whatever the index can't place.
+
+NominatimGeocoder is the network client.
+
+Nominatim's usage policy allows at most 1 request/second per application, so
+a signup burst must queue rather than hammer it (or eat 502s). This client:
+
+- keeps one pooled keep-alive requests.Session per container
+- paces upstream calls through a token bucket (NOMINATIM_RPS, default 1) and
+  gives up with GeocodeError instead of queueing past `max_wait`
+- retries connection errors, timeouts, 429 and 5xx with jittered exponential
+  backoff, all inside one per-lookup deadline (NOMINATIM_DEADLINE_S, default
+  20, below the route's 30 s maxDuration): each attempt's timeout is cut to
+  the time left, and a retry that couldn't finish in time isn't started, so
+  the handler still gets to send its 502
+- coalesces concurrent lookups of the same normalized address into one
+  upstream call
+
+stats() exposes queue depth, token wait time and call / retry / coalesce
+counts.
+
+Env:
+    NOMINATIM_URL        search endpoint (default: the public OSM instance)
+    NOMINATIM_RPS        upstream requests per second (default 1)
+    NOMINATIM_DEADLINE_S overall time for one lookup, retries included (default 20)
+    TIGER_ADDRESS_DB     address-range index (default districts/compiled/addresses.sqlite)
+"""
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from _geocache import normalize_address
+
+NOMINATIM_URL = os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+TIGER_ADDRESS_DB = os.environ.get(
+    "TIGER_ADDRESS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "districts", "compiled", "addresses.sqlite"),
+)
+USER_AGENT = "OtP civic-tech bot (https://github.com/akenney87/of-the-people)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MIN_ATTEMPT_S = 1.0   # don't start an attempt with less time than this left
+
+
+class GeocodeError(Exception):
+    """The geocoder could not give an answer (as opposed to "no such address")."""
+
+
+class TokenBucket:
+    """Reservation-style token bucket: acquire() blocks until the caller's slot."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def acquire(self, max_wait=None):
+        """Take a token, sleeping for it if needed; returns seconds waited.
+
+        Raises GeocodeError, without taking a token, when the wait would
+        exceed `max_wait`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                raise GeocodeError("Geocoding failed: geocoder queue is full, try again shortly")
+            self._tokens -= 1   # may go negative: that's the queue of reservations
+            self.waiting += 1
+        try:
+            if wait:
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                self.total_wait += wait
+                self.max_wait_seen = max(self.max_wait_seen, wait)
+        return wait
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class NominatimGeocoder:
+    name = "nominatim"
+
+    def __init__(self, url=NOMINATIM_URL, rate=1.0, timeout=8, retries=3, max_wait=10.0, pool_size=10,
+                 deadline=20.0):
+        self.url = url
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.max_wait = max_wait
+        self.bucket = TokenBucket(rate)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT  # polite UA per Nominatim's TOS
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = self.retried = self.coalesced = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(rate=float(os.environ.get("NOMINATIM_RPS", 1.0)),
+                   deadline=float(os.environ.get("NOMINATIM_DEADLINE_S", 20.0)))
+
+    def geocode(self, street, city, state, zip_code):
+        """(lat, lon) for an address, None if it isn't found; GeocodeError on failure."""
+        key = normalize_address(street, city, state, zip_code)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._fetch(f"{street}, {city}, {state}, {zip_code}")
+            return flight.result
+        except GeocodeError as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _fetch(self, query):
+        give_up = time.monotonic() + self.deadline
+        error = "timed out"
+        for attempt in range(self.retries + 1):
+            left = give_up - time.monotonic()
+            if left < MIN_ATTEMPT_S:
+                break
+            self.bucket.acquire(min(self.max_wait, left - MIN_ATTEMPT_S))
+            self._count("calls")
+            try:
+                resp = self.session.get(self.url, params={"q": query, "format": "json"},
+                                        timeout=max(0.1, min(self.timeout, give_up - time.monotonic())))
+                if resp.status_code in RETRY_STATUSES and attempt < self.retries:
+                    raise requests.HTTPError(f"{resp.status_code} from geocoder", response=resp)
+                resp.raise_for_status()
+                return self._coords(resp.json())
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status = getattr(e.response, "status_code", None)
+                retryable = status is None or status in RETRY_STATUSES
+                if not retryable or attempt == self.retries:
+                    raise GeocodeError(f"Geocoding failed: {e}")
+                error = e
+                backoff = min(4.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                if time.monotonic() + backoff + MIN_ATTEMPT_S > give_up:
+                    break
+                self._count("retried")
+                time.sleep(backoff)
+            except (requests.RequestException, ValueError) as e:
+                raise GeocodeError(f"Geocoding failed: {e}")
+        raise GeocodeError(f"Geocoding failed: {error} (gave up after {self.deadline:g}s)")
+
+    @staticmethod
+    def _coords(rows):
+        if not rows:
+            return None
+        try:
+            return float(rows[0]["lat"]), float(rows[0]["lon"])
+        except (KeyError, TypeError, ValueError):
+            raise GeocodeError("Geocoder returned malformed coordinates.")
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "retried": self.retried,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+            "queue_depth": self.bucket.waiting,
+            "wait_s_total": round(self.bucket.total_wait, 3),
+            "wait_s_max": round(self.bucket.max_wait_seen, 3),
+        }
+
+
+class TigerGeocoder:
+    """Offline house-number interpolation over TIGER address ranges; no network."""
+
+    name = "tiger"
+
+    def __init__(self, db_path=TIGER_ADDRESS_DB):
+        from address_index import AddressIndex  # districts/ is on sys.path in the handlers
+
+        self.index = AddressIndex(db_path)
+        self.hits = self.misses = 0
+
+    def geocode(self, street, city, state, zip_code):
+        try:
+            coords = self.index.lookup(street, zip_code)
+        except Exception as e:  # sqlite3.Error, a corrupt row: let the next backend try
+            raise GeocodeError(f"Geocoding failed: address index: {e}")
+        if coords is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return coords
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class ChainGeocoder:
+    """Ask each geocoder in turn; the first coordinates win.
+
+    A backend that errors is skipped like one that found nothing. The chain
+    only raises GeocodeError if no backend found the address and at least one
+    failed, so "not found" still means every backend said so.
+    """
+
+    def __init__(self, geocoders):
+        self.geocoders = list(geocoders)
+        self.answered = {g.name: 0 for g in self.geocoders}
+
+    def geocode(self, street, city, state, zip_code):
+        error = None
+        for geocoder in self.geocoders:
+            try:
+                coords = geocoder.geocode(street, city, state, zip_code)
+            except GeocodeError as e:
+                error = e
+                continue
+            if coords is not None:
+                self.answered[geocoder.name] += 1
+                return coords
+        if error is not None:
+            raise error
+        return None
+
+    def stats(self):
+        return {g.name: {**g.stats(), "answered": self.answered[g.name]} for g in self.geocoders}
+
+
+def from_env():
+    """The handlers' geocoder: TIGER first when its index exists, then Nominatim."""
+    nominatim = NominatimGeocoder.from_env()
+    if os.path.exists(TIGER_ADDRESS_DB):
+        return ChainGeocoder([TigerGeocoder(TIGER_ADDRESS_DB), nominatim])
+    return ChainGeocoder([nominatim])
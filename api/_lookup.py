@@ -0,0 +1,138 @@
+"""Pieces shared by the district lookup routes."""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler
+
+
+def preload_from_env():
+    """Load district indexes at import time when OTP_PRELOAD_DISTRICTS is set.
+
+    "1" / "all" loads every supported state; "GA,NY" just those. Returns
+    preload()'s {"STATE/layer": ms} (empty when unset), so the cold request
+    finds everything loaded and reports it under the "import" stage.
+    """
+    setting = os.environ.get("OTP_PRELOAD_DISTRICTS", "").strip()
+    if not setting or setting.lower() in ("0", "false", "no"):
+        return {}
+    from find_district import preload
+
+    if setting.lower() in ("1", "all", "true", "yes"):
+        return preload()
+    return preload([s.strip().upper() for s in setting.split(",") if s.strip()])
+
+
+def normalize_districts(d):
+    """Match the column shape the supabase users table expects."""
+    cong = d.get("congressional")
+    senate = d.get("state_senate")
+    return {
+        "county": d.get("county"),
+        "cong_district":          cong.zfill(2) if cong else None,
+        "state_senate_dist":      senate.lstrip("0") if senate else None,
+        "state_house_dist":       d.get("state_assembly") or None,
+        # Sub-county layers — these may be None until shapefile data lands.
+        "county_commission_dist": d.get("county_commission") or None,
+        "city_council_dist":      d.get("city_council") or None,
+        "school_board_dist":      d.get("school_board") or None,
+    }
+
+
+def geocode_cached(cache, geocoder, street, city, state, zip_code):
+    """((lat, lon) or None if not found, cache hit?); GeocodeError passes through."""
+    key = cache.key(street, city, state, zip_code)
+    cached = cache.get(key)
+    if cached:
+        return cached, True
+    coords = geocoder.geocode(street, city, state, zip_code)
+    if coords is not None:
+        cache.put(key, *coords)
+    return coords, False
+
+
+class StageTimer:
+    """Per-stage wall times for one request.
+
+    Rendered as a Server-Timing header for the browser's network panel, and
+    as one JSON log line per request (never including the address) so the
+    p50/p99 of each stage can be followed in the function logs.
+
+    `counters` ({name: callable returning a dict}) are snapshotted into that
+    log line: the container's running totals, such as the geocode cache's
+    hit rate, which are otherwise invisible on a serverless function.
+    """
+
+    def __init__(self, route, cold, counters=None):
+        self.route = route
+        self.cold = cold
+        self.counters = counters or {}
+        self.stages = {}
+        self.fields = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000)
+
+    def add(self, name, ms):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def total_ms(self):
+        return (time.perf_counter() - self._t0) * 1000
+
+    def header(self):
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        return ", ".join([*parts, f"total;dur={self.total_ms():.1f}"])
+
+    def log(self, status):
+        record = {
+            "route": self.route,
+            "status": status,
+            "cold": self.cold,
+            **self.fields,
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stages.items()},
+            "total_ms": round(self.total_ms(), 2),
+        }
+        if self.counters:
+            record["counters"] = {name: snapshot() for name, snapshot in self.counters.items()}
+        print(json.dumps(record), file=sys.stdout, flush=True)
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    """Base for the route handlers: JSON responses with timing attached.
+
+    Subclasses set `import_ms` (what the container paid before its first
+    request) and `counters` (passed to StageTimer).
+    """
+
+    import_ms = 0.0
+    counters = None
+    _served = False
+    _timer = None
+
+    def _json(self, status, payload, headers=None):
+        self.send_response(status)
+        headers = {"Content-Type": "application/json", "Cache-Control": "no-store", **(headers or {})}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if self._timer is not None:
+            self.send_header("Server-Timing", self._timer.header())
+        self.end_headers()
+        if payload is not None:
+            self.wfile.write(json.dumps(payload).encode("utf-8"))
+        if self._timer is not None:
+            self._timer.log(status)
+
+    def _start_timer(self):
+        cls = type(self)
+        self._timer = StageTimer(self.path.split("?")[0], cold=not cls._served, counters=cls.counters)
+        if not cls._served:
+            self._timer.add("import", cls.import_ms)
+        cls._served = True
@@ -0,0 +1,148 @@
+"""Vercel Python serverless function: many addresses -> resolved districts.
+
+POST /api/lookup-districts-batch
+Body: { addresses: [ { street_address, city, state, zip_code }, ... ] }
+200:  { results: [ { county, cong_district, ... } | { error }, ... ],
+        resolved, failed, deferred }
+4xx:  { error }
+
+For admin imports and partner onboarding. Results come back in input order,
+one per address. An address that can't be geocoded or resolved gets its own
+{ error } entry and doesn't fail the batch. Geocoding runs on a small thread
+pool; the geocoder's own rate limiter still paces Nominatim, so large
+all-new batches go fastest with the TIGER address index built (see
+districts/address_index.py). The points are then resolved with one
+get_districts_batch call per state instead of one lookup per address.
+
+At Nominatim's 1 request/second a batch of new addresses can outlast the
+function's maxDuration (60 s in vercel.json). Geocoding stops after
+LOOKUP_BATCH_DEADLINE_S (default 40) so the rest of the batch still gets a
+response: addresses not geocoded by then come back as { error, deferred: true }
+and can be resubmitted (anything that finished in the background is cached by
+then).
+
+As in lookup-districts.py, street addresses live only in this handler's
+memory, and responses carry Server-Timing plus one JSON log line per request.
+"""
+
+import time
+
+_IMPORT_T0 = time.perf_counter()
+
+import json  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor, wait  # noqa: E402
+
+_DISTRICTS = os.path.join(os.path.dirname(__file__), "..", "districts")
+sys.path.insert(0, _DISTRICTS)
+sys.path.insert(0, os.path.dirname(__file__))
+from find_district import SHAPEFILES, get_districts_batch  # noqa: E402
+from _geocache import GeocodeCache  # noqa: E402
+import _geocoder  # noqa: E402
+from _geocoder import GeocodeError  # noqa: E402
+from _lookup import LookupHandler, StageTimer, geocode_cached, normalize_districts, preload_from_env  # noqa: E402
+
+MAX_ADDRESSES = int(os.environ.get("LOOKUP_BATCH_MAX", 500))
+GEOCODE_WORKERS = int(os.environ.get("LOOKUP_BATCH_WORKERS", 8))
+GEOCODE_DEADLINE_S = float(os.environ.get("LOOKUP_BATCH_DEADLINE_S", 40))
+REQUIRED = ("street_address", "city", "state", "zip_code")
+
+_GEOCACHE = GeocodeCache.from_env()
+_GEOCODER = _geocoder.from_env()
+_PRELOADED = preload_from_env()
+# Running totals for this container, snapshotted into every request's log line.
+_COUNTERS = {"geocache": _GEOCACHE.stats, "geocoder": _GEOCODER.stats}
+
+_IMPORT_MS = (time.perf_counter() - _IMPORT_T0) * 1000
+
+
+def _geocode(item):
+    """(lat, lon) for one batch item, or {"error": ...}."""
+    if not isinstance(item, dict) or not all(item.get(k) and isinstance(item[k], str) for k in REQUIRED):
+        return {"error": "street_address, city, state, zip_code are required strings."}
+    # Checked before geocoding so unsupported addresses don't spend Nominatim's quota.
+    if item["state"].upper() not in SHAPEFILES:
+        return {"error": f"State '{item['state']}' not supported. Supported: {sorted(SHAPEFILES)}"}
+    try:
+        coords, _cached = geocode_cached(
+            _GEOCACHE, _GEOCODER, item["street_address"], item["city"], item["state"], item["zip_code"]
+        )
+    except GeocodeError as e:
+        return {"error": str(e)}
+    return coords if coords is not None else {"error": "Address not found."}
+
+
+def _result(future):
+    """_geocode's answer, or an { error } for this item alone."""
+    if not future.done() or future.cancelled():
+        return {"error": "Not geocoded within this request's time limit; resubmit it.", "deferred": True}
+    try:
+        return future.result()
+    except Exception as e:  # a geocode cache or geocoder bug: don't lose the whole batch
+        return {"error": f"Geocoding failed: {e}"}
+
+
+def lookup_batch(addresses, timer=None, deadline_s=None):
+    """One result dict per address, in input order.
+
+    Addresses still waiting for the geocoder `deadline_s` seconds in (default
+    LOOKUP_BATCH_DEADLINE_S) are returned as deferred errors, not awaited.
+    """
+    timer = timer or StageTimer("lookup_batch", cold=False)
+    deadline_s = GEOCODE_DEADLINE_S if deadline_s is None else deadline_s
+    pool = ThreadPoolExecutor(max_workers=max(1, min(GEOCODE_WORKERS, len(addresses))))
+    with timer.stage("geocode"):
+        futures = [pool.submit(_geocode, item) for item in addresses]
+        wait(futures, timeout=deadline_s)
+        # Queued items are dropped; in-flight ones finish in the background
+        # (and land in the geocode cache) but aren't waited for.
+        pool.shutdown(wait=False, cancel_futures=True)
+    results = [_result(f) for f in futures]
+
+    by_state = {}
+    for i, coords in enumerate(results):
+        if isinstance(coords, tuple):
+            by_state.setdefault(addresses[i]["state"].upper(), []).append((i, *coords))
+
+    for state, items in by_state.items():
+        idx, lats, lons = zip(*items)
+        try:
+            batch = get_districts_batch(lats, lons, state, timings=timer.stages)
+        except Exception as e:
+            batch = {"error": f"District lookup failed: {e}"}
+        for n, i in enumerate(idx):
+            if "error" in batch:
+                results[i] = {"error": batch["error"]}
+            else:
+                results[i] = normalize_districts({field: values[n] for field, values in batch.items()})
+    return results
+
+
+class handler(LookupHandler):
+    import_ms = _IMPORT_MS
+    counters = _COUNTERS
+
+    def do_POST(self):
+        self._start_timer()
+        try:
+            length = int(self.headers.get("Content-Length", 0) or 0)
+            body = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+        except (ValueError, json.JSONDecodeError):
+            return self._json(400, {"error": "Invalid JSON body."})
+
+        addresses = body.get("addresses") if isinstance(body, dict) else None
+        if not isinstance(addresses, list) or not addresses:
+            return self._json(400, {"error": "addresses must be a non-empty array."})
+        if len(addresses) > MAX_ADDRESSES:
+            return self._json(413, {"error": f"At most {MAX_ADDRESSES} addresses per batch."})
+
+        results = lookup_batch(addresses, self._timer)
+        failed = sum(1 for r in results if "error" in r)
+        deferred = sum(1 for r in results if r.get("deferred"))
+        self._timer.fields.update(addresses=len(addresses), failed=failed, deferred=deferred)
+        return self._json(200, {"results": results, "resolved": len(results) - failed,
+                                "failed": failed, "deferred": deferred})
+
+    def do_GET(self):
+        self._json(405, {"error": "POST only."})
@@ -5,52 +5,94 @@ Body: { street_address, city, state, zip_code }
 200:  { county, cong_district, state_senate_dist, state_house_dist }
 4xx:  { error }
 
-The street_address is held in this handler's memory only — we geocode it via
-Nominatim, point-in-polygon it against the TIGER shapefiles, and return the
+The street_address is held in this handler's memory only — we geocode it
+(offline against TIGER address ranges when that index is built, otherwise via
+Nominatim), point-in-polygon it against the TIGER shapefiles, and return the
 resolved district IDs. The caller (Register / Profile) then writes those onto
 the public.users row in Supabase. The street is never written to the DB.
+
+Geocodes are cached (api/_geocache.py) under a salted hash of the normalized
+address, holding only the coordinates, so a repeat lookup of the same address
+skips Nominatim without the street being kept anywhere.
+
+GET /api/lookup-districts?lat=34.30&lon=-83.82&state=GA
+200:  same body as POST, with long-lived Cache-Control and an ETag
+
+For callers that already hold coordinates. Nothing in the request identifies
+a street, so the response is shared and cacheable at the Vercel edge; the
+ETag changes with the boundary data (find_district.layer_set_version), and a
+matching If-None-Match gets a 304. Round coordinates (5 decimals, ~1 m) to
+share cache entries.
+
+GET /api/lookup-districts?warmup=1
+200:  { cold, import_ms, preloaded_at_import, loaded_ms, layers, precomputed,
+        local, geocache, geocoder }
+
+Loads every supported state's indexes so the next real lookup (typically a
+new user on the Register page) doesn't pay for them; point a scheduled ping
+at it to keep a container hot. Setting OTP_PRELOAD_DISTRICTS=all (or "GA,NY")
+does the same loading at import time instead.
+
+Every response carries a Server-Timing header (import on a cold container,
+geocode, load, pip, total) and writes one JSON log line with the same stages,
+a cold/warm flag and the container's geocode cache and geocoder counters
+(per backend; Nominatim's queue depth and rate-limit wait).
 """
 
-import json
-import os
-import sys
-from http.server import BaseHTTPRequestHandler
+import time
+
+_IMPORT_T0 = time.perf_counter()
 
-import requests
+import json  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+from urllib.parse import parse_qs, urlparse  # noqa: E402
 
 # districts/find_district.py is imported as a module rather than spawned as a
 # subprocess. Vercel's includeFiles config in vercel.json pulls the shapefiles
 # alongside this file so the path resolution in find_district.py just works.
 _DISTRICTS = os.path.join(os.path.dirname(__file__), "..", "districts")
 sys.path.insert(0, _DISTRICTS)
-from find_district import get_districts  # noqa: E402
-
-
-def _normalize(d):
-    """Match the column shape the supabase users table expects."""
-    cong = d.get("congressional")
-    senate = d.get("state_senate")
-    return {
-        "county": d.get("county"),
-        "cong_district":          cong.zfill(2) if cong else None,
-        "state_senate_dist":      senate.lstrip("0") if senate else None,
-        "state_house_dist":       d.get("state_assembly") or None,
-        # Sub-county layers — these may be None until shapefile data lands.
-        "county_commission_dist": d.get("county_commission") or None,
-        "city_council_dist":      d.get("city_council") or None,
-        "school_board_dist":      d.get("school_board") or None,
-    }
-
-
-class handler(BaseHTTPRequestHandler):
-    def _json(self, status, payload):
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Cache-Control", "no-store")
-        self.end_headers()
-        self.wfile.write(json.dumps(payload).encode("utf-8"))
+sys.path.insert(0, os.path.dirname(__file__))
+from find_district import (  # noqa: E402
+    SHAPEFILES, get_districts, layer_set_version, layer_stats, local_layer_stats, precomputed_stats, preload,
+)
+from _geocache import GeocodeCache  # noqa: E402
+import _geocoder  # noqa: E402
+from _geocoder import GeocodeError  # noqa: E402
+from _lookup import LookupHandler, geocode_cached, normalize_districts, preload_from_env  # noqa: E402
+
+# Module scope so warm invocations of this container share them: the cache's
+# entries, and the geocoder's keep-alive pool, rate limiter and in-flight
+# lookups.
+_GEOCACHE = GeocodeCache.from_env()
+_GEOCODER = _geocoder.from_env()
+_PRELOADED = preload_from_env()
+# Running totals for this container, snapshotted into every request's log line.
+_COUNTERS = {"geocache": _GEOCACHE.stats, "geocoder": _GEOCODER.stats}
+
+# What this container paid before its first request could start: importing
+# shapely/numpy/find_district, setting up the cache and geocoder, and any
+# OTP_PRELOAD_DISTRICTS layer loads. Reported as the "import" stage on the
+# cold request only.
+_IMPORT_MS = (time.perf_counter() - _IMPORT_T0) * 1000
+
+# GET lookups by coordinate are the same for everyone until the boundaries
+# change, so the edge may keep them for a year. A deploy (which is how new
+# boundaries ship) purges Vercel's edge cache anyway, and the ETag lets
+# browsers revalidate for free. Bump RESPONSE_VERSION when the response shape
+# changes without the layers changing.
+RESPONSE_VERSION = "1"
+GET_CACHE_CONTROL = "public, max-age=86400, s-maxage=31536000, stale-while-revalidate=86400"
+ADDRESS_PARAMS = ("street_address", "street", "address", "city", "zip_code", "zip")
+
+
+class handler(LookupHandler):
+    import_ms = _IMPORT_MS
+    counters = _COUNTERS
 
     def do_POST(self):
+        self._start_timer()
         try:
             length = int(self.headers.get("Content-Length", 0) or 0)
             body = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
@@ -65,40 +107,76 @@ class handler(BaseHTTPRequestHandler):
         if not all([street, city, state, zip_code]):
             return self._json(400, {"error": "street_address, city, state, zip_code are required."})
 
-        # Geocode. Polite User-Agent per Nominatim's TOS.
         try:
-            geo = requests.get(
-                "https://nominatim.openstreetmap.org/search",
-                params={"q": f"{street}, {city}, {state}, {zip_code}", "format": "json"},
-                headers={"User-Agent": "OtP civic-tech bot (https://github.com/akenney87/of-the-people)"},
-                timeout=20,
-            )
-            geo.raise_for_status()
-            geo_rows = geo.json()
-        except requests.RequestException as e:
-            return self._json(502, {"error": f"Geocoding failed: {e}"})
-
-        if not geo_rows:
-            return self._json(404, {"error": "Address not found."})
+            with self._timer.stage("geocode"):
+                coords, cached = geocode_cached(_GEOCACHE, _GEOCODER, street, city, state, zip_code)
+        except GeocodeError as e:
+            return self._json(502, {"error": str(e)})
+        self._timer.fields["geocode_cache"] = "hit" if cached else "miss"
 
-        try:
-            lat = float(geo_rows[0]["lat"])
-            lon = float(geo_rows[0]["lon"])
-        except (KeyError, ValueError):
-            return self._json(502, {"error": "Geocoder returned malformed coordinates."})
+        if coords is None:
+            return self._json(404, {"error": "Address not found."})
+        lat, lon = coords
 
         # Lookup
         try:
-            districts = get_districts(lat, lon, state)
+            districts = get_districts(lat, lon, state, timings=self._timer.stages)
         except Exception as e:
             return self._json(500, {"error": f"District lookup failed: {e}"})
 
         if isinstance(districts, dict) and districts.get("error"):
             return self._json(400, {"error": districts["error"]})
 
-        return self._json(200, _normalize(districts))
+        return self._json(200, normalize_districts(districts),
+                          {"X-Geocode-Cache": "hit" if cached else "miss"})
 
     def do_GET(self):
-        # Helpful when manually probing the function. Returns 405 so curl
-        # tooling treats it as a real method-not-allowed.
-        self._json(405, {"error": "POST only."})
+        """GET ?lat=&lon=&state= -> the same body as POST, cacheable at the edge.
+
+        Only coordinates are accepted: a street in a query string would end
+        up in CDN and access logs, so address parameters are refused.
+        """
+        self._start_timer()
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        if query.get("warmup"):
+            return self._warmup()
+        if any(k in query for k in ADDRESS_PARAMS):
+            return self._json(400, {"error": "GET takes lat, lon and state only; POST an address instead."})
+        try:
+            lat, lon = float(query["lat"]), float(query["lon"])
+        except (KeyError, ValueError):
+            return self._json(400, {"error": "lat and lon are required numbers (or POST an address)."})
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return self._json(400, {"error": "lat/lon out of range."})
+        state = (query.get("state") or "").upper()
+        if state not in SHAPEFILES:
+            return self._json(400, {"error": f"State '{state}' not supported. Supported: {sorted(SHAPEFILES)}"})
+
+        etag = f'"{RESPONSE_VERSION}-{state}-{layer_set_version(state)}"'
+        cache = {"Cache-Control": GET_CACHE_CONTROL, "ETag": etag}
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            return self._json(304, None, cache)
+
+        try:
+            districts = get_districts(lat, lon, state, timings=self._timer.stages)
+        except Exception as e:
+            return self._json(500, {"error": f"District lookup failed: {e}"})
+        if districts.get("error"):
+            return self._json(400, {"error": districts["error"]})
+        return self._json(200, normalize_districts(districts), cache)
+
+    def _warmup(self):
+        """GET ?warmup=1: load every state's indexes now and report the cost."""
+        cold = self._timer.cold
+        with self._timer.stage("load"):
+            loaded = preload()
+        return self._json(200, {
+            "cold": cold,
+            "import_ms": round(self.import_ms, 1),
+            "preloaded_at_import": _PRELOADED,
+            "loaded_ms": loaded,
+            "layers": layer_stats(),
+            "precomputed": precomputed_stats(),
+            "local": local_layer_stats(),
+            **{name: snapshot() for name, snapshot in _COUNTERS.items()},
+        })
@@ -0,0 +1,190 @@
+"""Offline street-address geocoder built from Census TIGER address ranges.
+
+TIGER's ADDRFEAT files (tl_2024_<county fips>_addrfeat.shp, one per county)
+give every street edge its house-number range and ZIP on each side. This
+module compiles them into one SQLite file, and then geocodes
+"<number> <street>, <zip>" in process by finding the edge whose range holds
+the number and interpolating along it. That takes a few milliseconds, needs
+no network, and needs no GDAL at lookup time.
+
+The interpolated point is then set back SIDE_OFFSET_M metres from the
+centerline toward the range's side of the street, as the Census geocoder
+does. TIGER district lines follow these same edges, so a point left on the
+centerline of a boundary street would land on the line itself.
+
+Build (any number of ADDRFEAT files; re-run to add counties):
+    python districts/address_index.py build districts/addrfeat/*.shp
+Probe:
+    python districts/address_index.py lookup "123 Main Street" 30501
+
+api/_geocoder.py puts this in front of Nominatim whenever the index exists.
+Addresses it can't place (new streets, PO boxes, counties not loaded) return
+None and fall through to Nominatim.
+"""
+
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+DISTRICTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(DISTRICTS_DIR, "compiled", "addresses.sqlite")
+SIDE_OFFSET_M = 5.0
+M_PER_DEG = 111_320.0
+
+# USPS Publication 28 abbreviations for the tokens TIGER spells short.
+SUFFIXES = {
+    "STREET": "ST", "AVENUE": "AVE", "ROAD": "RD", "DRIVE": "DR", "LANE": "LN",
+    "COURT": "CT", "CIRCLE": "CIR", "BOULEVARD": "BLVD", "PLACE": "PL",
+    "PARKWAY": "PKWY", "HIGHWAY": "HWY", "TERRACE": "TER", "TRAIL": "TRL",
+    "SQUARE": "SQ", "EXPRESSWAY": "EXPY", "CROSSING": "XING", "POINT": "PT",
+    "RIDGE": "RDG", "HOLLOW": "HOLW", "MOUNTAIN": "MTN", "SAINT": "ST",
+}
+DIRECTIONS = {
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+    "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW",
+}
+# Anything from a unit designator on is dropped: "12 Oak St Apt 4" -> "OAK ST".
+UNIT = re.compile(r"\b(APT|APARTMENT|UNIT|STE|SUITE|LOT|RM|ROOM|BLDG|FL|FLOOR)\b.*|#.*")
+
+
+def normalize_street(name):
+    name = UNIT.sub("", re.sub(r"[.,]", " ", str(name).upper()))
+    tokens = [SUFFIXES.get(t, DIRECTIONS.get(t, t)) for t in name.split()]
+    return " ".join(tokens)
+
+
+def parse_street(street):
+    """(123, "MAIN ST") from "123 Main Street", or None without a house number."""
+    m = re.match(r"\s*(\d+)[A-Za-z]?\s+(.+)", str(street or ""))
+    if not m:
+        return None
+    return int(m.group(1)), normalize_street(m.group(2))
+
+
+def _house_number(value):
+    return int(value) if value and str(value).isdigit() else None
+
+
+def build(shapefiles, db_path=DEFAULT_DB):
+    """Load ADDRFEAT shapefiles into `db_path`; returns the number of ranges written."""
+    import geopandas as gpd  # build-time only
+
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    db = sqlite3.connect(db_path)
+    db.executescript("""
+        create table if not exists ranges (
+            zip text not null, street text not null,
+            from_hn integer not null, to_hn integer not null, parity text,
+            coords text not null, source text not null, side text
+        );
+        create index if not exists ranges_zip_street on ranges (zip, street);
+    """)
+    if "side" not in {row[1] for row in db.execute("pragma table_info(ranges)")}:
+        db.execute("alter table ranges add column side text")  # older index: its rows stay on the centerline
+    cols = ["FULLNAME", "LFROMHN", "LTOHN", "RFROMHN", "RTOHN", "ZIPL", "ZIPR", "PARITYL", "PARITYR"]
+    written = 0
+    for path in shapefiles:
+        source = os.path.basename(path)
+        db.execute("delete from ranges where source = ?", (source,))  # rebuild, don't duplicate
+        gdf = gpd.read_file(path, columns=cols)
+        rows = []
+        for rec, geom in zip(gdf[cols].itertuples(index=False), gdf.geometry.values):
+            if geom is None or not rec.FULLNAME:
+                continue
+            coords = json.dumps([[round(x, 7), round(y, 7)] for x, y in geom.coords])
+            street = normalize_street(rec.FULLNAME)
+            for side, lo, hi, zip_code, parity in (("L", rec.LFROMHN, rec.LTOHN, rec.ZIPL, rec.PARITYL),
+                                                   ("R", rec.RFROMHN, rec.RTOHN, rec.ZIPR, rec.PARITYR)):
+                lo, hi = _house_number(lo), _house_number(hi)
+                if lo is None or hi is None or not zip_code:
+                    continue
+                rows.append((zip_code, street, lo, hi, parity, coords, source, side))
+        db.executemany(
+            "insert into ranges (zip, street, from_hn, to_hn, parity, coords, source, side) "
+            "values (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        db.commit()
+        written += len(rows)
+        print(f"  {source}: {len(rows)} ranges", file=sys.stderr)
+    db.close()
+    return written
+
+
+def _interpolate(coords, fraction, side=None, offset_m=SIDE_OFFSET_M):
+    """Point `fraction` of the way along a polyline (planar, fine at street scale).
+
+    With `side` ("L" or "R", relative to the edge's digitized direction, as
+    TIGER defines it) the point is moved `offset_m` metres perpendicular to
+    the segment it falls on, toward that side.
+    """
+    pairs = list(zip(coords, coords[1:]))
+    seg = [((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5 for (x0, y0), (x1, y1) in pairs]
+    target = sum(seg) * fraction
+    (x0, y0), (x1, y1) = pairs[-1]
+    x, y = coords[-1]
+    for ((a0, b0), (a1, b1)), length in zip(pairs, seg):
+        if target <= length and length:
+            t = target / length
+            (x0, y0), (x1, y1) = (a0, b0), (a1, b1)
+            x, y = a0 + (a1 - a0) * t, b0 + (b1 - b0) * t
+            break
+        target -= length
+    if side not in ("L", "R") or not offset_m:
+        return x, y
+    # Local metres per degree, then the segment's unit normal in metres.
+    kx, ky = M_PER_DEG * math.cos(math.radians(y)), M_PER_DEG
+    ex, ey = (x1 - x0) * kx, (y1 - y0) * ky
+    norm = math.hypot(ex, ey)
+    if not norm:
+        return x, y
+    sign = 1.0 if side == "L" else -1.0   # left of (ex, ey) is (-ey, ex)
+    return x - sign * ey / norm * offset_m / kx, y + sign * ex / norm * offset_m / ky
+
+
+class AddressIndex:
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = db_path
+        self._local = threading.local()  # sqlite connections are per thread
+
+    def _db(self):
+        if getattr(self._local, "db", None) is None:
+            db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            # An index built before sides were stored answers from the centerline.
+            has_side = "side" in {row[1] for row in db.execute("pragma table_info(ranges)")}
+            self._local.side = "side" if has_side else "null"
+            self._local.db = db
+        return self._local.db
+
+    def lookup(self, street, zip_code):
+        """(lat, lon) for a street address in a ZIP, or None if no range covers it."""
+        parsed = parse_street(street)
+        zip5 = str(zip_code or "")[:5]
+        if not parsed or len(zip5) != 5:
+            return None
+        number, name = parsed
+        db = self._db()
+        rows = db.execute(
+            f"select from_hn, to_hn, parity, coords, {self._local.side} from ranges "
+            "where zip = ? and street = ? and ? between min(from_hn, to_hn) and max(from_hn, to_hn)",
+            (zip5, name, number),
+        ).fetchall()
+        want = "E" if number % 2 == 0 else "O"
+        rows.sort(key=lambda r: r[2] not in (want, "B"))  # matching parity side first
+        for lo, hi, _parity, coords, side in rows:
+            fraction = 0.5 if hi == lo else (number - lo) / (hi - lo)
+            lon, lat = _interpolate(json.loads(coords), fraction, side)
+            return lat, lon
+        return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "build":
+        print(f"{build(sys.argv[2:])} ranges -> {DEFAULT_DB}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "lookup":
+        print(json.dumps(AddressIndex().lookup(sys.argv[2], sys.argv[3])))
+    else:
+        print('usage: address_index.py build <addrfeat.shp>... | lookup "<street>" <zip>')
+        sys.exit(1)
@@ -0,0 +1,247 @@
+"""Compile the registered district layers into find_district.py's artifacts.
+
+Each layer in SHAPEFILES / PER_STATE_COUNTIES / LOCAL_LAYERS becomes one file
+under districts/compiled/ holding only what a lookup reads: WKB polygons, their
+bboxes and the district-ID column. find_district.py mmaps those at runtime and
+never imports geopandas/GDAL for a layer that has a fresh artifact.
+
+`--grid` additionally builds each state's answer grid (compiled/<ST>.grid.npz):
+per cell of a fixed lat/lon grid, the district on every layer when the whole
+cell lies inside one polygon, so most lookups skip the polygon test entirely.
+
+`--overlay` builds each state's overlay (compiled/<ST>.overlay.idx): all of
+its layers intersected into atomic polygons that each carry the full tuple of
+districts, so one spatial query answers a whole lookup. The build checks the
+overlay against the per-layer answers on a sample grid and refuses to write
+it on any disagreement.
+
+Re-run after dropping in new TIGER files, and commit the output alongside them:
+    python districts/build_index.py            # every registered state
+    python districts/build_index.py GA         # just these states
+    python districts/build_index.py --grid     # also build grids (0.01 deg cells)
+    python districts/build_index.py --overlay  # also build overlays
+    python districts/build_index.py --check    # list stale / missing artifacts
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import shapely
+
+import find_district as fd
+
+# Cells are grown by this much (degrees) before the containment tests, so a
+# point that floors into a cell from a hair outside it is still covered.
+GRID_PAD = 1e-9
+
+
+def _layers(states):
+    """Unique LayerSpecs (by file and row filter) across the requested states."""
+    seen = {}
+    for state in states:
+        for spec in fd.layer_specs(state):
+            seen.setdefault(fd._compiled_path(spec.path, spec.where), spec)
+    return list(seen.values())
+
+
+def compile_layer(spec):
+    gdf = fd._read(spec.path, where=spec.where)
+    resolved = spec.column(gdf.columns) if callable(spec.column) else spec.column
+    index = fd.LayerIndex.from_frame(gdf, resolved)
+    out = fd._compiled_path(spec.path, spec.where)
+    fd.write_compiled_layer(out, index.geometries, index.values, {
+        "source": spec.path,
+        "where": spec.where,
+        "signature": fd._source_signature(spec.path),
+        "sizes": [os.path.getsize(path) for path in fd._source_files(spec.path)],
+        "columns": [c for c in gdf.columns if c != gdf.geometry.name],
+        "column": resolved,
+    })
+    return out
+
+
+def build_grid(state, cell):
+    """Build compiled/<state>.grid.npz; returns {layer: share of cells answered outright}."""
+    specs = _existing_specs(state)
+    indexes = [fd._layer(state, *spec) for spec in specs]
+    for index in indexes:
+        index._materialize(range(len(index)))
+
+    bounds = np.vstack([shapely.bounds(index.geometries) for index in indexes])
+    x0 = math.floor(bounds[:, 0].min() / cell) * cell
+    y0 = math.floor(bounds[:, 1].min() / cell) * cell
+    nx = math.ceil((bounds[:, 2].max() - x0) / cell)
+    ny = math.ceil((bounds[:, 3].max() - y0) / cell)
+    cols, rows = np.meshgrid(np.arange(nx), np.arange(ny))
+    left, bottom = x0 + cols.ravel() * cell, y0 + rows.ravel() * cell
+    boxes = shapely.box(left - GRID_PAD, bottom - GRID_PAD,
+                        left + cell + GRID_PAD, bottom + cell + GRID_PAD)
+
+    cells = np.full((len(boxes), len(indexes)), fd.GRID_NONE, dtype=np.int32)
+    for j, index in enumerate(indexes):
+        cell_idx, poly_idx = index.tree.query(boxes)
+        touching = shapely.intersects(index.geometries[poly_idx], boxes[cell_idx])
+        cell_idx, poly_idx = cell_idx[touching], poly_idx[touching]
+        count = np.bincount(cell_idx, minlength=len(boxes))
+        cells[count > 0, j] = fd.GRID_BOUNDARY
+        # A cell is answered outright only when exactly one polygon touches it
+        # and that polygon holds the whole cell, edges included, in its interior.
+        single = count[cell_idx] == 1
+        inside = shapely.contains_properly(index.geometries[poly_idx[single]], boxes[cell_idx[single]])
+        cells[cell_idx[single][inside], j] = poly_idx[single][inside]
+
+    meta = {
+        "state": state,
+        "origin": [x0, y0],
+        "cell": cell,
+        "layers": [
+            {"name": spec.name, "path": spec.path, "column": fd._column_id(spec.column),
+             "signature": fd._layer_signature(spec.path, spec.where), "values": index.values}
+            for spec, index in zip(specs, indexes)
+        ],
+    }
+    path = fd._grid_path(state)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, cells=cells.reshape(ny, nx, len(indexes)), meta=np.array(json.dumps(meta)))
+    touched = (cells != fd.GRID_NONE)
+    return {
+        name: round(float(((cells[:, j] >= 0).sum()) / max(touched[:, j].sum(), 1)), 3)
+        for j, (name, *_) in enumerate(specs)
+    }
+
+
+def _existing_specs(state):
+    return [
+        spec for spec in fd.layer_specs(state)
+        if os.path.exists(os.path.join(fd.DISTRICTS_DIR, spec.path))
+        or os.path.exists(fd._compiled_path(spec.path, spec.where))
+    ]
+
+
+def build_overlay(state, sample=200):
+    """Build compiled/<state>.overlay.idx after verifying it on a sample x sample grid.
+
+    Returns (atomic polygon count, sampled points the overlay answered).
+    Raises ValueError, writing nothing, if any sampled answer disagrees with
+    the per-layer lookup.
+    """
+    import geopandas as gpd
+
+    specs = _existing_specs(state)
+    indexes = [fd._layer(state, *spec) for spec in specs]
+    for index in indexes:
+        index._materialize(range(len(index)))
+
+    # Clip to the state's own legislative extent so the national county
+    # fallback doesn't pull every other state into the overlay. Points outside
+    # the frame match no atomic polygon and take the per-layer path.
+    own = np.vstack([
+        shapely.bounds(index.geometries)
+        for spec, index in zip(specs, indexes) if spec.name in ("cong", "upper", "lower")
+    ])
+    frame = shapely.box(own[:, 0].min(), own[:, 1].min(), own[:, 2].max(), own[:, 3].max())
+
+    atoms = None
+    for j, index in enumerate(indexes):
+        keep = np.flatnonzero(shapely.intersects(index.geometries, frame))
+        layer = gpd.GeoDataFrame(
+            {f"r{j}": keep}, geometry=shapely.intersection(index.geometries[keep], frame)
+        )
+        atoms = layer if atoms is None else gpd.overlay(atoms, layer, how="union", keep_geom_type=True)
+    atoms = atoms[~atoms.geometry.is_empty]
+    rows = atoms[[f"r{j}" for j in range(len(indexes))]].fillna(-1).to_numpy(dtype=np.int32)
+    geometries = atoms.geometry.values
+
+    xs, ys = np.meshgrid(
+        np.linspace(*shapely.bounds(frame)[[0, 2]], sample + 2)[1:-1],
+        np.linspace(*shapely.bounds(frame)[[1, 3]], sample + 2)[1:-1],
+    )
+    points = shapely.points(xs.ravel(), ys.ravel())
+    hit = fd.LayerIndex(geometries, [None] * len(geometries)).match_many(points)
+    answered = np.flatnonzero(hit >= 0)
+    for j, index in enumerate(indexes):
+        expected = index.match_many(points[answered])
+        bad = np.flatnonzero(rows[hit[answered], j] != expected)
+        if len(bad):
+            p = points[answered[bad[0]]]
+            raise ValueError(
+                f"{state} overlay disagrees with layer {specs[j][0]} at {len(bad)} sample "
+                f"point(s), e.g. ({p.y:.6f}, {p.x:.6f})"
+            )
+
+    fd.write_compiled_layer(fd._overlay_path(state), geometries, [None] * len(geometries), {
+        "state": state,
+        "layers": [
+            {"name": spec.name, "path": spec.path, "column": fd._column_id(spec.column),
+             "signature": fd._layer_signature(spec.path, spec.where), "values": index.values}
+            for spec, index in zip(specs, indexes)
+        ],
+    }, extra_arrays={"rows": rows})
+    return len(geometries), len(answered)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("states", nargs="*", help="state codes (default: all in SHAPEFILES)")
+    ap.add_argument("--check", action="store_true", help="report stale artifacts instead of building")
+    ap.add_argument("--grid", type=float, nargs="?", const=0.01, metavar="DEG",
+                    help="also build per-state answer grids with this cell size (default 0.01)")
+    ap.add_argument("--overlay", action="store_true", help="also build per-state overlay indexes")
+    args = ap.parse_args(argv)
+
+    states = [s.upper() for s in args.states] or sorted(fd.SHAPEFILES)
+    unknown = [s for s in states if s not in fd.SHAPEFILES]
+    if unknown:
+        ap.error(f"unsupported state(s): {unknown}")
+
+    stale = 0
+    for spec in _layers(states):
+        label = spec.path + (f" {spec.where}" if spec.where else "")
+        if args.check:
+            if not fd._usable_compiled(spec.path, spec.column, spec.where, strict=True):
+                stale += 1
+                print(f"  stale   {label}")
+            continue
+        if not os.path.exists(os.path.join(fd.DISTRICTS_DIR, spec.path)):
+            print(f"  skip    {label} (source missing)")
+            continue
+        t0 = time.perf_counter()
+        out = compile_layer(spec)
+        src_bytes = sum(os.path.getsize(path) for path in fd._source_files(spec.path))
+        print(f"  built   {label}: {src_bytes / 1e6:.1f} MB -> "
+              f"{os.path.getsize(out) / 1e6:.1f} MB in {time.perf_counter() - t0:.2f}s")
+
+    if args.grid and not args.check:
+        for state in states:
+            t0 = time.perf_counter()
+            interior = build_grid(state, args.grid)
+            print(f"  grid    {state} @ {args.grid} deg in {time.perf_counter() - t0:.2f}s; "
+                  f"interior share per layer: {interior}")
+
+    if args.overlay and not args.check:
+        for state in states:
+            t0 = time.perf_counter()
+            try:
+                count, checked = build_overlay(state)
+            except ValueError as e:
+                print(f"  FAILED  {state} overlay: {e}")
+                stale += 1
+                continue
+            print(f"  overlay {state}: {count} atomic regions in {time.perf_counter() - t0:.2f}s; "
+                  f"verified on {checked} sample points")
+
+    if args.check and stale:
+        print(f"{stale} layer(s) need `python districts/build_index.py`")
+        return 1
+    if stale:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Bulk district resolution: stream a file of coordinates through get_districts_batch.
+
+    python districts/find_district.py bulk users.csv resolved.csv [--state GA] [--workers 4]
+
+Input and output formats follow the file extension: .csv, .jsonl / .ndjson,
+or .parquet (needs pyarrow). Each input row needs `lat` and `lon`; a `state`
+column overrides --state per row, and every other column (a user id, say) is
+passed through untouched. Rows come back in input order with the
+get_districts fields added, plus `error` for rows that could not be resolved.
+
+The file is read and written a chunk at a time, and the chunks are spread over
+a process pool. At most two chunks per worker are read ahead of the writer,
+so memory stays flat however large the input is. Each worker loads and
+indexes the layers once, then reuses them for every chunk it gets.
+Throughput goes to stderr as it runs.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+
+import find_district as fd
+
+CHUNK_ROWS = 5000
+BASE_FIELDS = ["state", "congressional", "state_senate", "state_assembly", "county"]
+
+
+def _output_fields(input_fields):
+    local = list(dict.fromkeys(layer["field"] for layer in fd.LOCAL_LAYERS))
+    return list(dict.fromkeys([*input_fields, *BASE_FIELDS, *local, "error"]))
+
+
+def _format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".parquet":
+        return "parquet"
+    raise SystemExit(f"unsupported file type: {path} (want .csv, .jsonl or .parquet)")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("parquet input/output needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def read_chunks(path, size=CHUNK_ROWS):
+    """Yield lists of row dicts, `size` rows at a time."""
+    fmt = _format(path)
+    if fmt == "parquet":
+        pa = _pyarrow()
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=size):
+            yield batch.to_pylist()
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(f) if fmt == "csv" else (json.loads(line) for line in f if line.strip())
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class _Writer:
+    """Streams row dicts to csv / jsonl / parquet with a fixed column set."""
+
+    def __init__(self, path, fields):
+        self.fmt, self.fields = _format(path), fields
+        if self.fmt == "parquet":
+            pa = _pyarrow()
+            self._pa = pa
+            self._schema = pa.schema([(name, pa.string()) for name in fields])
+            self._out = pa.parquet.ParquetWriter(path, self._schema)
+            return
+        self._out = open(path, "w", newline="", encoding="utf-8")
+        if self.fmt == "csv":
+            self._csv = csv.DictWriter(self._out, fieldnames=fields, extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, rows):
+        if self.fmt == "csv":
+            self._csv.writerows(rows)
+        elif self.fmt == "jsonl":
+            for row in rows:
+                self._out.write(json.dumps({k: row.get(k) for k in self.fields}) + "\n")
+        else:
+            columns = {
+                name: [None if row.get(name) is None else str(row.get(name)) for row in rows]
+                for name in self.fields
+            }
+            self._out.write_table(self._pa.table(columns, schema=self._schema))
+
+    def close(self):
+        self._out.close()
+
+
+def resolve_chunk(args):
+    """Worker: add district fields to one chunk of rows, one batch call per state."""
+    rows, default_state = args
+    by_state = {}
+    for i, row in enumerate(rows):
+        try:
+            lat, lon = float(row["lat"]), float(row["lon"])
+        except (KeyError, TypeError, ValueError):
+            row["error"] = "missing or non-numeric lat/lon"
+            continue
+        state = (row.get("state") or default_state).upper()
+        by_state.setdefault(state, []).append((i, lat, lon))
+
+    for state, items in by_state.items():
+        idx, lats, lons = zip(*items)
+        result = fd.get_districts_batch(np.array(lats), np.array(lons), state)
+        if "error" in result:
+            for i in idx:
+                rows[i]["error"] = result["error"]
+            continue
+        for field, values in result.items():
+            for i, value in zip(idx, values):
+                rows[i][field] = value
+    return rows
+
+
+def _bounded_imap(pool, func, items, depth):
+    """pool.imap, in order, but only pulling `items` up to `depth` tasks ahead of the consumer.
+
+    Pool.imap's task handler drains the whole iterable up front, which would
+    read (and queue) every chunk of the input regardless of the writer's pace.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= depth:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="find_district.py bulk", description=__doc__.splitlines()[0])
+    ap.add_argument("input")
+    ap.add_argument("output")
+    ap.add_argument("--state", default="GA", help="state for rows without a state column (default GA)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--chunk", type=int, default=CHUNK_ROWS, help=f"rows per work unit (default {CHUNK_ROWS})")
+    args = ap.parse_args(argv)
+
+    chunks = read_chunks(args.input, args.chunk)
+    first = next(chunks, [])
+    writer = _Writer(args.output, _output_fields(first[0].keys() if first else ["lat", "lon"]))
+
+    def work():
+        if first:
+            yield first, args.state
+        for chunk in chunks:
+            yield chunk, args.state
+
+    t0 = time.perf_counter()
+    done = errors = 0
+    try:
+        if args.workers > 1:
+            pool = Pool(args.workers)
+            results = _bounded_imap(pool, resolve_chunk, work(), 2 * args.workers)
+        else:
+            pool, results = None, map(resolve_chunk, work())
+        for rows in results:
+            writer.write(rows)
+            done += len(rows)
+            errors += sum(1 for row in rows if row.get("error"))
+            elapsed = time.perf_counter() - t0
+            print(f"\r{done} points, {done / elapsed:,.0f} pts/s", end="", file=sys.stderr)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - t0
+    print(f"\r{done} points in {elapsed:.1f}s ({done / elapsed if elapsed else 0:,.0f} pts/s), "
+          f"{errors} errors -> {args.output}", file=sys.stderr)
+    return 0
@@ -0,0 +1,212 @@
+"""Check every find_district lookup engine against plain geopandas, and time them.
+
+    python districts/check_engines.py [--states GA NY] [--interior 200] [--boundary 200] [--repeat 5] [--json out.json]
+
+The reference is the original lookup, written out longhand: read each layer
+with geopandas and take the first row whose polygon contains the point
+(gdf.contains, no index, no artifacts). Each engine get_districts_batch
+offers ("index", "grid", "overlay", "auto") then resolves the same corpus
+(districts/lookup_corpus.py: random interior points plus points a few meters
+off district and county lines), and every field of every point must match.
+Grid and overlay are skipped for a state that hasn't built them
+(build_index.py --grid / --overlay). A state missing one of its base layers
+(no source and no artifact) is skipped entirely, since get_districts_batch
+can't answer for it, and listed in the report. An engine that raises is
+reported as failed.
+
+Per engine it reports the first pass with an empty layer cache (load + lookups),
+warm lookups per second over --repeat passes, the Python heap peak
+(tracemalloc) and the process RSS high-water mark. Exits 1 on any mismatch or
+failed engine, or when no corpus state has all its base layers.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import shapely
+
+import find_district as fd
+import lookup_corpus
+
+ENGINES = ("index", "grid", "overlay", "auto")
+BASE_FIELDS = {"cong": "congressional", "upper": "state_senate", "lower": "state_assembly", "county": "county"}
+
+
+def _reference_layer(spec):
+    gdf = fd._read(spec.path, where=spec.where)
+    column = spec.column(gdf.columns) if callable(spec.column) else spec.column
+    return gdf, column
+
+
+def _first_match(gdf, column, point):
+    hits = gdf[gdf.contains(point)]
+    return str(hits.iloc[0][column]) if len(hits) and column in hits.columns else None
+
+
+def reference(state, points):
+    """Columnar results for one state's points, the slow obvious way."""
+    pts = shapely.points([p["lon"] for p in points], [p["lat"] for p in points])
+    specs = {spec.name: spec for spec in fd.layer_specs(state)}
+    out = {"state": [state] * len(points)}
+    for name, field in BASE_FIELDS.items():
+        gdf, column = _reference_layer(specs[name])   # main() skips states missing one
+        out[field] = [_first_match(gdf, column, pt) for pt in pts]
+
+    registered = fd._local_index()["by_state"].get(state, [])
+    for layer in registered:
+        out.setdefault(layer["field"], [None] * len(points))
+    frames = {}
+    for i, (pt, county) in enumerate(zip(pts, out["county"])):
+        for layer in fd._local_layers_for(state, county):
+            if layer["path"] not in frames:
+                try:
+                    frames[layer["path"]] = _reference_layer(fd.LayerSpec(layer["path"], layer["path"], layer["attribute"]))
+                except Exception:
+                    frames[layer["path"]] = None
+            if frames[layer["path"]] is not None:
+                out[layer["field"]][i] = _first_match(*frames[layer["path"]], pt)
+    return out
+
+
+def _missing_layers(state):
+    """Base layers of `state` with neither a source file nor a compiled artifact."""
+    return [spec.name for spec in fd.layer_specs(state)
+            if spec.name in BASE_FIELDS
+            and not os.path.exists(os.path.join(fd.DISTRICTS_DIR, spec.path))
+            and not os.path.exists(fd._compiled_path(spec.path, spec.where))]
+
+
+def _available(engine, state):
+    return engine in ("index", "auto") or fd._precomputed_index(engine, state) is not None
+
+
+def _reset_caches():
+    fd.clear_layer_cache()
+    with fd._LAYERS_LOCK:
+        fd._PRECOMPUTED.clear()
+
+
+def run_engine(engine, by_state, repeat):
+    """(results per state, stats) for one engine over the whole corpus."""
+    _reset_caches()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    results = {}
+    for state, points in by_state.items():
+        lats = np.array([p["lat"] for p in points])
+        lons = np.array([p["lon"] for p in points])
+        results[state] = fd.get_districts_batch(lats, lons, state, engine=engine)
+    first = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for state, points in by_state.items():
+            fd.get_districts_batch([p["lat"] for p in points], [p["lon"] for p in points], state, engine=engine)
+    warm = time.perf_counter() - t0
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = sum(len(points) for points in by_state.values())
+    return results, {
+        "first_pass_s": round(first, 3),
+        "lookups_per_s": round(n * repeat / warm, 1) if warm else None,
+        "heap_peak_mb": round(peak / 2**20, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(expected, got, points):
+    """Mismatches as dicts, one per differing (point, field)."""
+    if "error" in got:
+        return [{"error": got["error"]}]
+    bad = []
+    for field in sorted(set(expected) | set(got)):
+        want = expected.get(field, [None] * len(points))
+        have = got.get(field, [None] * len(points))
+        for p, a, b in zip(points, want, have):
+            if a != b:
+                bad.append({**p, "field": field, "expected": a, "got": b})
+    return bad
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    lookup_corpus.add_arguments(ap)
+    ap.add_argument("--engines", nargs="*", default=list(ENGINES), choices=ENGINES)
+    ap.add_argument("--repeat", type=int, default=5, help="warm passes per engine for the speed figure")
+    ap.add_argument("--json", help="also write the report here")
+    args = ap.parse_args(argv)
+
+    points = lookup_corpus.from_args(args)
+    by_state = {}
+    for p in points:
+        by_state.setdefault(p["state"], []).append(p)
+    print(f"corpus {lookup_corpus.fingerprint(points)}: {len(points)} points", file=sys.stderr)
+    skipped = {state: _missing_layers(state) for state in by_state}
+    skipped = {state: missing for state, missing in skipped.items() if missing}
+    for state, missing in skipped.items():
+        print(f"skipping {state}: no data for layer(s) {', '.join(missing)}", file=sys.stderr)
+        del by_state[state]
+    points = [p for pts in by_state.values() for p in pts]
+    if not points:
+        print("nothing to check", file=sys.stderr)
+        return 1
+
+    t0 = time.perf_counter()
+    expected = {state: reference(state, pts) for state, pts in by_state.items()}
+    ref_s = time.perf_counter() - t0
+    report = {
+        "corpus": {"points": len(points), "fingerprint": lookup_corpus.fingerprint(points)},
+        "skipped_states": skipped,
+        "reference": {"lookups_per_s": round(len(points) / ref_s, 1) if ref_s else None},
+        "engines": {},
+    }
+
+    failed = False
+    print(f"{'engine':<10}{'first pass s':>14}{'lookups/s':>12}{'heap MB':>10}{'rss MB':>9}  result", file=sys.stderr)
+    print(f"{'reference':<10}{'':>14}{report['reference']['lookups_per_s']:>12}", file=sys.stderr)
+    for engine in args.engines:
+        states = {s: pts for s, pts in by_state.items() if _available(engine, s)}
+        if not states:
+            report["engines"][engine] = {"skipped": "not built for any corpus state"}
+            print(f"{engine:<10}  skipped (not built)", file=sys.stderr)
+            continue
+        try:
+            results, stats = run_engine(engine, states, args.repeat)
+        except Exception as e:
+            failed = True
+            report["engines"][engine] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"{engine:<10}  FAILED {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+        mismatches = [m for s, pts in states.items() for m in compare(expected[s], results[s], pts)]
+        failed |= bool(mismatches)
+        kinds = {}
+        for m in mismatches:
+            kinds[m.get("kind", "error")] = kinds.get(m.get("kind", "error"), 0) + 1
+        report["engines"][engine] = {
+            **stats,
+            "states": sorted(states),
+            "mismatches": len(mismatches),
+            "mismatches_by_kind": kinds,
+            "examples": mismatches[:5],
+        }
+        verdict = "ok" if not mismatches else f"{len(mismatches)} MISMATCHES {kinds}"
+        print(f"{engine:<10}{stats['first_pass_s']:>14}{stats['lookups_per_s']:>12}"
+              f"{stats['heap_peak_mb']:>10}{stats['max_rss_mb']:>9}  {verdict}", file=sys.stderr)
+        for m in mismatches[:5]:
+            print(f"    {json.dumps(m)}", file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
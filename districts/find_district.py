@@ -3,6 +3,8 @@
 Called from api/lookup-districts.py (Vercel Python function) and from the
 districts/ CLI:
     python districts/find_district.py <lat> <lon> [state_code]
+    python districts/find_district.py bulk <in> <out> [--state GA] [--workers N]
+    python districts/find_district.py serve [--socket PATH]
 
 Returns JSON on stdout:
     {
@@ -15,22 +17,36 @@ Returns JSON on stdout:
         "city_council": null          # TBD, schema-ready
     }
 
+Backfills and re-verification should call get_districts_batch(lats, lons,
+state) instead: it takes coordinate arrays and returns the same fields as
+columns, one entry per input point.
+
 Adding another state means dropping its TIGER shapefiles into a sibling
-directory and registering it in SHAPEFILES below. Local sub-county layers
-(commission, city council) plug in via LOCAL_LAYERS.
+directory and registering it in SHAPEFILES below, plus either its FIPS code
+in STATE_FIPS (to take its counties from the national county file) or its
+own county shapefile in PER_STATE_COUNTIES. Local sub-county layers
+(commission, city council) plug in via LOCAL_LAYERS. Then run
+`python districts/build_index.py` so the function can load the compact
+artifacts under compiled/ instead of parsing shapefiles through GDAL.
 """
 
 import os
 import sys
 import json
+import hashlib
+import logging
+import mmap
+import time
+import threading
+from collections import namedtuple
 
-import geopandas as gpd
-from shapely.geometry import Point
+import numpy as np
+import shapely
 
 
 DISTRICTS_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# state code -> TIGER shapefile bundle paths. FIPS: NY=36, GA=13.
+# state code -> TIGER shapefile bundle paths.
 SHAPEFILES = {
     "NY": {
         "cong":  "NY_Cong/tl_2024_36_cd119.shp",
@@ -44,15 +60,24 @@ SHAPEFILES = {
     },
 }
 
+# State FIPS codes, used to pull one state's rows out of national TIGER files.
+STATE_FIPS = {
+    "NY": "36",
+    "GA": "13",
+}
+
 PER_STATE_COUNTIES = {
     "GA": "GA_Counties/tl_2024_13_county.shp",
 }
 COUNTIES_FALLBACK_PATH = "counties/tl_2024_us_county.shp"
 
 # Sub-county layers, registered per (state, county). Each entry resolves a
-# single field on the returned dict from a single layer file. Missing layers
-# silently return None for that field so signups don't blow up before we have
-# data for a given county / city.
+# single field on the returned dict from a single layer file. `city` is
+# descriptive only: a lookup runs a city's layer for every point in its
+# county, and points outside the city's polygons get None.
+# Missing or failing layers return None for that field so signups don't blow
+# up before we have data for a given county / city; local_layer_stats()
+# counts them.
 #
 # `field`     — key in the JSON output
 # `path`      — file path under districts/, can be .shp or .geojson
@@ -74,95 +99,829 @@ LOCAL_LAYERS = [
 ]
 
 
-def _read(rel_path):
-    return gpd.read_file(os.path.join(DISTRICTS_DIR, rel_path))
+class LayerIndex:
+    """STRtree over one layer's polygons, plus the single column we read on a match.
+
+    A lookup is a bounding-box query against the tree followed by an exact
+    contains() test on the (prepared) candidates only, so cost tracks the few
+    polygons near the point instead of every polygon in the layer.
+    """
+
+    def __init__(self, geometries, values):
+        self.geometries = np.asarray(geometries, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+        self.values = list(values)
+
+    @classmethod
+    def from_frame(cls, gdf, column):
+        if callable(column):
+            column = column(gdf.columns)
+        if column and column in gdf.columns:
+            values = [str(v) for v in gdf[column].values]
+        else:
+            values = [None] * len(gdf)
+        return cls(gdf.geometry.values, values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _materialize(self, rows):
+        """Hook for indexes that decode geometries lazily; plain indexes hold them all."""
+
+    def lookup(self, point):
+        """Value of the first polygon (in file order) that contains `point`, else None."""
+        candidates = self.tree.query(point)
+        if not len(candidates):
+            return None
+        candidates.sort()
+        self._materialize(candidates)
+        hits = candidates[shapely.contains(self.geometries[candidates], point)]
+        return self.values[hits[0]] if len(hits) else None
+
+    def match_many(self, points):
+        """Row of the first containing polygon for each point, -1 where none does.
+
+        One bulk bbox query against the tree, then a single vectorized
+        contains() over the (point, candidate polygon) pairs. The polygons are
+        prepared, so that exact test is cheap.
+        """
+        best = np.full(len(points), len(self.values), dtype=np.int64)
+        if len(points) and len(self.values):
+            point_idx, poly_idx = self.tree.query(points)
+            self._materialize(np.unique(poly_idx))
+            hit = shapely.contains(self.geometries[poly_idx], points[point_idx])
+            np.minimum.at(best, point_idx[hit], poly_idx[hit])
+        best[best == len(self.values)] = -1
+        return best
+
+    def lookup_many(self, points):
+        """Vectorized lookup(): one value (or None) per input point."""
+        return [self.values[i] if i >= 0 else None for i in self.match_many(points)]
+
+
+class CompiledLayerIndex(LayerIndex):
+    """LayerIndex backed by a build_index.py artifact instead of a shapefile.
+
+    The artifact is mmapped; the tree is built over the stored bboxes and each
+    polygon's WKB is only decoded the first time a query lands in its bbox, so
+    a cold start touches neither GDAL nor the polygons it never needs.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _compiled_header(self._mm)
+        arrays = {
+            name: np.frombuffer(self._mm, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+            for name, (dtype, shape, offset) in header["arrays"].items()
+        }
+        self.header = header
+        self.arrays = arrays
+        self.bounds = arrays["bounds"]
+        self._offsets = arrays["offsets"]
+        self._wkb = arrays["wkb"]
+        self.values = header["values"]
+        self.geometries = np.full(len(self.values), None, dtype=object)
+        self.tree = shapely.STRtree(shapely.box(*self.bounds.T)) if len(self.values) else shapely.STRtree([])
+
+    def _materialize(self, rows):
+        rows = [r for r in rows if self.geometries[r] is None]
+        if not rows:
+            return
+        geoms = shapely.from_wkb([
+            self._wkb[self._offsets[r]:self._offsets[r + 1]].tobytes() for r in rows
+        ])
+        shapely.prepare(geoms)
+        self.geometries[rows] = geoms
+
+
+# Compiled artifacts live under districts/compiled/, mirroring the source
+# layer's relative path: compiled/GA_Cong/tl_2024_13_cd119.shp.idx. Layout:
+# magic, u32 header length, JSON header, then 8-byte aligned raw arrays
+# (wkb bytes, int64 offsets into them, float64 n x 4 bboxes, plus any extras
+# such as the overlay's per-layer row table).
+COMPILED_SUBDIR = "compiled"
+_COMPILED_MAGIC = b"OTPIDX01"
+
+
+def _compiled_path(rel_path, where=None):
+    # A filtered subset of a file (one state's rows of the national county
+    # file) compiles to its own artifact: tl_2024_us_county.shp.STATEFP=13.idx
+    subset = "".join(f".{k}={v}" for k, v in sorted((where or {}).items()))
+    return os.path.join(DISTRICTS_DIR, COMPILED_SUBDIR, rel_path + subset + ".idx")
+
+
+# Content hashes of source files, keyed by path and only recomputed when the
+# file's size or mtime moves: path -> ((size, mtime_ns), sha256 hex).
+_FILE_HASHES = {}
+_FILE_HASHES_LOCK = threading.Lock()
+
+
+def _source_files(rel_path):
+    """A layer file plus its .dbf sidecar (shapefiles), whichever exist."""
+    full = os.path.join(DISTRICTS_DIR, rel_path)
+    dbf = os.path.splitext(full)[0] + ".dbf"
+    return [path for path in dict.fromkeys((full, dbf)) if os.path.exists(path)]
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _file_hash(path):
+    stamp = _file_stamp(path)
+    with _FILE_HASHES_LOCK:
+        cached = _FILE_HASHES.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    with _FILE_HASHES_LOCK:
+        _FILE_HASHES[path] = (stamp, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def _source_signature(rel_path):
+    """sha256 of a layer file and of its .dbf sidecar.
+
+    Stored in each artifact and compared at load time. Content, not sizes or
+    mtimes: a deploy checkout rewrites every mtime, and an edited attribute
+    (a swapped district label) can leave every size unchanged.
+    """
+    return [_file_hash(path) for path in _source_files(rel_path)]
+
+
+def _compiled_header(buf):
+    if bytes(buf[:8]) != _COMPILED_MAGIC:
+        raise ValueError("not a compiled district index")
+    size = int.from_bytes(buf[8:12], "little")
+    return json.loads(bytes(buf[12:12 + size]).decode("utf-8"))
+
+
+def write_compiled_layer(path, geometries, values, meta, extra_arrays=None):
+    """Serialize polygons plus one value per polygon to `path`.
 
+    `meta` is merged into the JSON header (source, signature, column, ...);
+    `extra_arrays` are stored alongside the geometry arrays and come back in
+    CompiledLayerIndex.arrays.
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    wkb = shapely.to_wkb(geometries)
+    offsets = np.zeros(len(wkb) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in wkb], out=offsets[1:])
+    arrays = {
+        "wkb": np.frombuffer(b"".join(wkb), dtype=np.uint8),
+        "offsets": offsets,
+        "bounds": shapely.bounds(geometries).astype(np.float64).reshape(len(geometries), 4),
+        **(extra_arrays or {}),
+    }
+    header = {**meta, "values": list(values)}
+    # The array offsets live in the header itself, so size the header with
+    # placeholder entries and leave slack for the real numbers' digits.
+    header["arrays"] = {name: [arr.dtype.str, list(arr.shape), 0] for name, arr in arrays.items()}
+    pos = 12 + len(json.dumps(header).encode("utf-8")) + 64
+    for name, arr in arrays.items():
+        pos += -pos % 8
+        header["arrays"][name][2] = pos
+        pos += arr.nbytes
+    blob = json.dumps(header).encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(_COMPILED_MAGIC + len(blob).to_bytes(4, "little") + blob)
+        for name, arr in arrays.items():
+            f.write(b"\0" * (header["arrays"][name][2] - f.tell()))
+            f.write(arr.tobytes())
+
+
+# Validated artifact headers: artifact path -> (artifact and source stamps,
+# header or None if stale). A warm lookup only stats the files; the header is
+# parsed, and the sources hashed, again only when one of them changes.
+_VALIDATED = {}
+
+
+def _read_compiled_header(path):
+    with open(path, "rb") as f:
+        head = f.read(12)
+        return _compiled_header(head + f.read(int.from_bytes(head[8:12], "little")))
+
+
+def _artifact_header(rel_path, where=None, strict=False):
+    """Header of this layer/subset's artifact if it still matches its source, else None.
+
+    Source sizes are always compared. Content hashes are only compared when a
+    source file is newer than the artifact (edited since the build), so a
+    deploy that builds its artifacts after checkout never hashes a shapefile
+    on a cold start. `strict` (build_index.py --check) always compares them.
+    """
+    path = _compiled_path(rel_path, where)
+    try:
+        art = _file_stamp(path)
+    except OSError:
+        return None
+    sources = _source_files(rel_path)
+    stamps = (art, [_file_stamp(p) for p in sources])
+    cached = _VALIDATED.get(path)
+    if cached and cached[0] == stamps and not strict:
+        return cached[1]
+    try:
+        header = _read_compiled_header(path)
+    except (OSError, ValueError):
+        header = None
+    # A missing source is fine (artifact-only deploys); a changed one is not.
+    if header is not None and sources:
+        if header.get("sizes") != [size for size, _ in stamps[1]]:
+            header = None
+        elif (strict or any(mtime > art[1] for _, mtime in stamps[1])) \
+                and header["signature"] != _source_signature(rel_path):
+            header = None
+    _VALIDATED[path] = (stamps, header)
+    return header
+
+
+def _usable_compiled(rel_path, column, where=None, strict=False):
+    """Path of a fresh artifact for this layer/column/subset, or None to read the source."""
+    header = _artifact_header(rel_path, where, strict)
+    if header is None:
+        return None
+    wanted = column(header["columns"]) if callable(column) else column
+    if header["column"] != wanted:
+        return None
+    return _compiled_path(rel_path, where)
+
+
+def _cong_column(columns):
+    # CD119FP today; the session number moves every redistricting cycle.
+    return next((c for c in columns if c.startswith("CD") and c.endswith("FP")), None)
+
+
+# Process-wide layer registry. A warm Vercel container (or a long-running CLI)
+# parses and indexes each layer once; later lookups only pay for the
+# point-in-polygon query. Entries are keyed by (state, layer) and dropped when
+# the backing files' size or mtime moves (the .dbf included), so a refresh on
+# disk is picked up without a restart. Files are re-statted at most every
+# LAYER_RECHECK_S seconds, not on every lookup. A compiled artifact is
+# preferred over the shapefile when present.
+LAYER_RECHECK_S = 2.0
+_LAYERS = {}        # (state, layer) -> {"path", "stamp": [(size, mtime_ns)], "checked", "index"}
+_LAYER_STATS = {}   # (state, layer) -> {"path", "source", "loads", "hits", "load_ms"}
+_LAYERS_LOCK = threading.Lock()
+
+
+# One layer a lookup reads. `where` ({column: value}) restricts the read to
+# matching rows, e.g. a single state out of the national county file.
+LayerSpec = namedtuple("LayerSpec", "name path column where", defaults=(None,))
+
+
+def _read(rel_path, columns=None, where=None):
+    """Read a layer, optionally just `columns` (plus geometry) and rows matching `where`.
+
+    Both are pushed down to GDAL, so a filtered read of the national county
+    file never materializes the other states or the unused DBF columns.
+    """
+    # Deferred: geopandas (and GDAL under it) is only needed when a layer has
+    # no compiled artifact.
+    import geopandas as gpd
+    kwargs = {}
+    if columns is not None:
+        # GDAL drops ignored fields before it evaluates the filter.
+        kwargs["columns"] = list(dict.fromkeys([*columns, *(where or {})]))
+    if where:
+        kwargs["where"] = " AND ".join(f"{k} = '{v}'" for k, v in where.items())
+    return gpd.read_file(os.path.join(DISTRICTS_DIR, rel_path), **kwargs)
 
-def _read_counties(state):
+
+# Index load time spent on the current thread. get_districts_batch diffs it to
+# split a lookup's time into loading and point-in-polygon.
+_LOAD_CLOCK = threading.local()
+
+
+def _charge_load(ms):
+    _LOAD_CLOCK.ms = getattr(_LOAD_CLOCK, "ms", 0.0) + ms
+
+
+def _layer(state, name, rel_path, column, where=None):
+    """Return the LayerIndex for (state, name), building it at most once per file version."""
+    key = (state, name)
+    now = time.monotonic()
+    with _LAYERS_LOCK:
+        entry = _LAYERS.get(key)
+        if entry and now - entry["checked"] < LAYER_RECHECK_S:
+            _LAYER_STATS[key]["hits"] += 1
+            return entry["index"]
+    compiled = _usable_compiled(rel_path, column, where)
+    backing = compiled or os.path.join(DISTRICTS_DIR, rel_path)
+    # A shapefile's attributes live in the .dbf, which can be refreshed alone.
+    stamp = [_file_stamp(path) for path in ([compiled] if compiled else _source_files(rel_path))]
+    with _LAYERS_LOCK:
+        stats = _LAYER_STATS.setdefault(
+            key, {"path": rel_path, "source": None, "loads": 0, "hits": 0, "load_ms": 0.0}
+        )
+        entry = _LAYERS.get(key)
+        if entry and entry["path"] == backing and entry["stamp"] == stamp:
+            entry["checked"] = now
+            stats["hits"] += 1
+            return entry["index"]
+
+        t0 = time.perf_counter()
+        if compiled:
+            index = CompiledLayerIndex(compiled)
+        else:
+            columns = None if callable(column) else [column]
+            index = LayerIndex.from_frame(_read(rel_path, columns, where), column)
+        stats["path"] = rel_path
+        stats["source"] = "compiled" if compiled else "file"
+        stats["loads"] += 1
+        ms = (time.perf_counter() - t0) * 1000
+        stats["load_ms"] += ms
+        _charge_load(ms)
+        _LAYERS[key] = {"path": backing, "stamp": stamp, "checked": now, "index": index}
+        return index
+
+
+def layer_stats():
+    """Snapshot of the layer registry: loads, cache hits and cumulative load time."""
+    with _LAYERS_LOCK:
+        return {
+            f"{state}/{name}": {**stats, "load_ms": round(stats["load_ms"], 1)}
+            for (state, name), stats in _LAYER_STATS.items()
+        }
+
+
+def clear_layer_cache():
+    with _LAYERS_LOCK:
+        _LAYERS.clear()
+        _LAYER_STATS.clear()
+
+
+def _county_spec(state):
     per_state = PER_STATE_COUNTIES.get(state)
-    if per_state and os.path.exists(os.path.join(DISTRICTS_DIR, per_state)):
-        return _read(per_state)
-    return _read(COUNTIES_FALLBACK_PATH)
+    if per_state and (
+        os.path.exists(os.path.join(DISTRICTS_DIR, per_state))
+        or os.path.exists(_compiled_path(per_state))
+    ):
+        return LayerSpec("county", per_state, "NAME")
+    # National fallback: only this state's rows, cached (and compiled) per state.
+    # Reading it unfiltered would name a neighbouring state's county near a border.
+    if state not in STATE_FIPS:
+        raise ValueError(f"No county layer for {state}: add its FIPS code to STATE_FIPS "
+                         f"or a shapefile to PER_STATE_COUNTIES in find_district.py")
+    return LayerSpec("county", COUNTIES_FALLBACK_PATH, "NAME", {"STATEFP": STATE_FIPS[state]})
+
+
+def layer_specs(state):
+    """LayerSpec for every layer a lookup in `state` reads."""
+    bundle = SHAPEFILES[state]
+    specs = [
+        LayerSpec("cong", bundle["cong"], _cong_column),
+        LayerSpec("upper", bundle["upper"], "SLDUST"),
+        LayerSpec("lower", bundle["lower"], "SLDLST"),
+        _county_spec(state),
+    ]
+    specs += [
+        LayerSpec(layer["path"], layer["path"], layer["attribute"])
+        for layer in LOCAL_LAYERS if layer["state"].upper() == state
+    ]
+    return specs
+
 
+def preload(states=None):
+    """Load and index every layer of `states` (default: all supported) up front.
 
-def _resolve_local_layers(point, state, county):
-    """Run any registered sub-county layers for this (state, county)."""
-    out = {}
-    for layer in LOCAL_LAYERS:
-        if layer["state"].upper() != state: continue
-        if layer.get("county") and layer["county"] != county: continue
+    Also maps the state's grid and overlay indexes where they are built.
+    Returns {"STATE/layer": ms spent}; layers with no file on disk are skipped.
+    """
+    loaded = {}
+    for state in states or sorted(SHAPEFILES):
+        for spec in layer_specs(state):
+            if not (os.path.exists(os.path.join(DISTRICTS_DIR, spec.path))
+                    or os.path.exists(_compiled_path(spec.path, spec.where))):
+                continue
+            t0 = time.perf_counter()
+            _layer(state, *spec)
+            loaded[f"{state}/{spec.name}"] = round((time.perf_counter() - t0) * 1000, 1)
+        for kind in ("grid", "overlay"):
+            t0 = time.perf_counter()
+            if _precomputed_index(kind, state) is not None:
+                loaded[f"{state}/{kind}"] = round((time.perf_counter() - t0) * 1000, 1)
+    return loaded
+
+
+# Precomputed answers, both built by build_index.py. They hold per-layer row
+# numbers into each layer's values, so they're only trusted for layers whose
+# source still matches what they were built from.
+#
+#   grid     (--grid)    per cell of a fixed lat/lon grid, the polygon row that
+#                        strictly contains the whole cell on each layer; cells
+#                        that straddle a boundary fall back to the exact test.
+#   overlay  (--overlay) every layer overlaid into "atomic" polygons, each
+#                        carrying its full tuple of layer rows, so one spatial
+#                        query answers every layer at once.
+GRID_BOUNDARY = -1   # no precomputed answer here: run the exact test
+GRID_NONE = -2       # no polygon of the layer touches the cell / atomic region
+
+_FROM_GRID, _FROM_OVERLAY = 1, 2
+
+
+def _grid_path(state):
+    return os.path.join(DISTRICTS_DIR, COMPILED_SUBDIR, f"{state}.grid.npz")
+
+
+def _overlay_path(state):
+    return os.path.join(DISTRICTS_DIR, COMPILED_SUBDIR, f"{state}.overlay.idx")
+
+
+def _layer_signature(rel_path, where=None):
+    """Content signature of a layer's data: from its artifact when that is fresh
+    (no hashing), else hashed from the source. OSError when neither exists."""
+    header = _artifact_header(rel_path, where)
+    if header is not None:
+        return header["signature"]
+    if not os.path.exists(os.path.join(DISTRICTS_DIR, rel_path)):
+        raise FileNotFoundError(rel_path)
+    return _source_signature(rel_path)
+
+
+def _column_id(column):
+    """A LayerSpec's value column as stored in headers: the name, or the resolver's name."""
+    return column if isinstance(column, str) else column.__name__
+
+
+def layer_set_version(state):
+    """Short hash naming the boundary data a lookup in `state` answers from.
+
+    It changes when a layer is added, removed or re-pointed, or when the file
+    it loads from changes (same content hash as the compiled artifacts).
+    api/lookup-districts.py uses it as the ETag for coordinate-keyed lookups.
+    """
+    parts = []
+    for spec in layer_specs(state.upper()):
+        try:
+            signature = _layer_signature(spec.path, spec.where)
+        except OSError:
+            signature = None   # not on disk: that layer answers None
+        parts.append([spec.name, spec.path, _column_id(spec.column), spec.where, signature])
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _fresh_layers(built, state):
+    """{layer name: (column, values)} for the built layers that still match their source.
+
+    The returned column is the layer's position in the index; the value column
+    a layer was built from must also still be the one its spec reads.
+    """
+    current = {spec.name: spec for spec in layer_specs(state)}
+    fresh = {}
+    for col, layer in enumerate(built):
+        spec = current.get(layer["name"])
+        try:
+            ok = (spec is not None and spec.path == layer["path"]
+                  and layer.get("column") == _column_id(spec.column)
+                  and _layer_signature(spec.path, spec.where) == layer["signature"])
+        except OSError:
+            ok = False
+        if ok:
+            fresh[layer["name"]] = (col, layer["values"])
+    return fresh
+
+
+class GridIndex:
+    def __init__(self, path, state):
+        with np.load(path) as z:
+            meta = json.loads(str(z["meta"]))
+            self.cells = z["cells"]
+        self.x0, self.y0 = meta["origin"]
+        self.cell = meta["cell"]
+        self.layers = _fresh_layers(meta["layers"], state)
+
+    def cells_for(self, xs, ys):
+        """(n, layers) array of grid answers; points off the grid read as GRID_BOUNDARY."""
+        ny, nx = self.cells.shape[:2]
+        with np.errstate(invalid="ignore"):
+            col = np.floor((xs - self.x0) / self.cell)
+            row = np.floor((ys - self.y0) / self.cell)
+        inside = (col >= 0) & (col < nx) & (row >= 0) & (row < ny)
+        out = np.full((len(xs), self.cells.shape[2]), GRID_BOUNDARY, dtype=self.cells.dtype)
+        out[inside] = self.cells[row[inside].astype(np.int64), col[inside].astype(np.int64)]
+        return out
+
+
+class OverlayIndex(CompiledLayerIndex):
+    """Atomic regions of all of a state's layers; `rows[i]` is region i's layer-row tuple."""
+
+    def __init__(self, path, state):
+        super().__init__(path)
+        self.rows = self.arrays["rows"]
+        self.layers = _fresh_layers(self.header["layers"], state)
+
+
+_PRECOMPUTED = {}        # (kind, state) -> {"stamp", "checked", "index"}
+_PRECOMPUTED_STATS = {}  # state -> {"points", "interior_points", "layers": {name: {...}}}
+
+
+def _precomputed_index(kind, state):
+    path = _grid_path(state) if kind == "grid" else _overlay_path(state)
+    if not os.path.exists(path):
+        return None
+    now = time.monotonic()
+    with _LAYERS_LOCK:
+        entry = _PRECOMPUTED.get((kind, state))
+        if entry is not None and now - entry["checked"] < LAYER_RECHECK_S:
+            return entry["index"]
+    # Which layers are still fresh is decided at load, so a source edited (or
+    # a layer re-pointed) since then reloads the index just like a rebuilt one.
+    stamp = [_file_stamp(path)]
+    for spec in layer_specs(state):
+        stamp += [spec.path, _column_id(spec.column), *(_file_stamp(p) for p in _source_files(spec.path))]
+    with _LAYERS_LOCK:
+        entry = _PRECOMPUTED.get((kind, state))
+        if entry is None or entry["stamp"] != stamp:
+            t0 = time.perf_counter()
+            index = GridIndex(path, state) if kind == "grid" else OverlayIndex(path, state)
+            _charge_load((time.perf_counter() - t0) * 1000)
+            entry = _PRECOMPUTED[(kind, state)] = {"stamp": stamp, "index": index}
+        entry["checked"] = now
+        return entry["index"]
+
+
+def precomputed_stats():
+    """Per-state hit rates: share of lookups each layer answered without a polygon test.
+
+    `interior_points` counts points the grid and overlay answered on every layer.
+    """
+    with _LAYERS_LOCK:
+        out = {}
+        for state, stats in _PRECOMPUTED_STATS.items():
+            layers = {}
+            for name, c in stats["layers"].items():
+                total = c["grid"] + c["overlay"] + c["exact"]
+                hits = c["grid"] + c["overlay"]
+                layers[name] = {**c, "hit_rate": round(hits / total, 4) if total else None}
+            out[state] = {
+                "points": stats["points"],
+                "interior_points": stats["interior_points"],
+                "interior_rate": round(stats["interior_points"] / stats["points"], 4) if stats["points"] else None,
+                "layers": layers,
+            }
+        return out
+
+
+def _stats_for(state):
+    return _PRECOMPUTED_STATS.setdefault(state, {"points": 0, "interior_points": 0, "layers": {}})
+
+
+def _precompute(state, lons, lats, points, engine):
+    """Grid and overlay answers for every point, or None when neither applies.
+
+    Returns {"columns": {layer: j}, "answers": (n, layers), "source": (n, layers),
+    "values": {layer: values}}; answers stay GRID_BOUNDARY where only the exact
+    test can decide.
+    """
+    grid = _precomputed_index("grid", state) if engine in ("auto", "grid") else None
+    overlay = _precomputed_index("overlay", state) if engine in ("auto", "overlay") else None
+    if grid is None and overlay is None:
+        return None
+
+    columns = {spec.name: j for j, spec in enumerate(layer_specs(state))}
+    answers = np.full((len(points), len(columns)), GRID_BOUNDARY, dtype=np.int64)
+    source = np.zeros(answers.shape, dtype=np.int8)
+    values = {}
+
+    if grid is not None:
+        cells = grid.cells_for(lons, lats)
+        for name, (col, layer_values) in grid.layers.items():
+            if name not in columns: continue
+            j = columns[name]
+            answers[:, j] = cells[:, col]
+            source[answers[:, j] != GRID_BOUNDARY, j] = _FROM_GRID
+            values[name] = layer_values
+
+    if overlay is not None and overlay.layers:
+        pending = np.flatnonzero((answers == GRID_BOUNDARY).any(axis=1))
+        atoms = overlay.match_many(points[pending])
+        matched, atoms = pending[atoms >= 0], atoms[atoms >= 0]
+        for name, (col, layer_values) in overlay.layers.items():
+            if name not in columns: continue
+            j = columns[name]
+            unanswered = answers[matched, j] == GRID_BOUNDARY
+            found = overlay.rows[atoms[unanswered], col]
+            answers[matched[unanswered], j] = np.where(found >= 0, found, GRID_NONE)
+            source[matched[unanswered], j] = _FROM_OVERLAY
+            values.setdefault(name, layer_values)
+
+    with _LAYERS_LOCK:
+        stats = _stats_for(state)
+        stats["points"] += len(points)
+        stats["interior_points"] += int((answers != GRID_BOUNDARY).all(axis=1).sum())
+    return {"columns": columns, "answers": answers, "source": source, "values": values}
+
+
+def _resolve_layer(state, spec, points, rows, pre):
+    """Values of one layer for points[rows]: precomputed answers first, exact test for the rest."""
+    name = spec.name
+    out = [None] * len(rows)
+    pending = np.arange(len(rows))
+    if pre is not None:
+        grid_hits = overlay_hits = 0
+        if name in pre["values"]:
+            j = pre["columns"][name]
+            answers = pre["answers"][rows, j]
+            values = pre["values"][name]
+            for k in np.flatnonzero(answers >= 0):
+                out[k] = values[answers[k]]
+            pending = np.flatnonzero(answers == GRID_BOUNDARY)
+            source = pre["source"][rows, j]
+            grid_hits = int((source == _FROM_GRID).sum())
+            overlay_hits = int((source == _FROM_OVERLAY).sum())
+        with _LAYERS_LOCK:
+            c = _stats_for(state)["layers"].setdefault(name, {"grid": 0, "overlay": 0, "exact": 0})
+            c["grid"] += grid_hits
+            c["overlay"] += overlay_hits
+            c["exact"] += len(pending)
+    if len(pending):
+        found = _layer(state, *spec).lookup_many(points[rows[pending]])
+        for k, value in zip(pending, found):
+            out[k] = value
+    return out
+
+
+# LOCAL_LAYERS indexed by (state, county), built on first use so a lookup
+# only touches the layers registered for its own county (plus any state-wide
+# ones, county None). A lookup has no city to go on, so a city layer is run
+# for its whole county and its own polygons bound it. Each layer file is then
+# loaded and indexed lazily through the layer registry the first time a point
+# lands in its county. Rebuilt when an entry of LOCAL_LAYERS is added, removed
+# or replaced (keyed on the entries' identity).
+_LOCAL_INDEX = {"key": None, "by_county": {}, "by_state": {}}
+_LOCAL_STATS = {}   # layer path -> {"queries", "points", "query_ms", "missing", "errors", "last_error"}
+
+log = logging.getLogger(__name__)
+
+
+def _local_index():
+    key = tuple(id(layer) for layer in LOCAL_LAYERS)
+    with _LAYERS_LOCK:
+        if _LOCAL_INDEX["key"] != key:
+            by_county, by_state = {}, {}
+            for layer in LOCAL_LAYERS:
+                state = layer["state"].upper()
+                by_county.setdefault((state, layer.get("county")), []).append(layer)
+                by_state.setdefault(state, []).append(layer)
+            _LOCAL_INDEX.update(key=key, by_county=by_county, by_state=by_state)
+        return _LOCAL_INDEX
+
+
+def _local_layers_for(state, county):
+    """LOCAL_LAYERS entries that apply to a point in (state, county), in registry order."""
+    index = _local_index()
+    layers = index["by_county"].get((state, None), [])
+    if county is not None:
+        layers = layers + index["by_county"].get((state, county), [])
+    order = {id(layer): i for i, layer in enumerate(index["by_state"].get(state, []))}
+    return sorted(layers, key=lambda layer: order[id(layer)])
+
+
+def local_layer_stats():
+    """Per-layer query counts, time, and missing-file / error counts for LOCAL_LAYERS."""
+    with _LAYERS_LOCK:
+        return {path: {**c, "query_ms": round(c["query_ms"], 1)} for path, c in _LOCAL_STATS.items()}
+
+
+def _resolve_local_layers(points, state, counties, pre=None):
+    """Run any registered sub-county layers, each against the rows in its county.
+
+    Returns one column per local field; rows outside a layer's county stay None.
+    A missing layer file or a failing layer leaves its field None rather than
+    failing the signup, but is counted in local_layer_stats() and logged.
+    """
+    registered = _local_index()["by_state"].get(state, [])
+    out = {layer["field"]: [None] * len(points) for layer in registered}
+    if not registered:
+        return out
+
+    # Group rows by county once, then hand each layer the rows of every
+    # county it applies to.
+    by_county = {}
+    for i, county in enumerate(counties):
+        by_county.setdefault(county, []).append(i)
+    rows_for = {}
+    for county, rows in by_county.items():
+        for layer in _local_layers_for(state, county):
+            rows_for.setdefault(id(layer), []).extend(rows)
+
+    for layer in registered:
+        rows = rows_for.get(id(layer))
+        if not rows:
+            continue
+        rows = np.sort(np.asarray(rows, dtype=np.int64))
+        with _LAYERS_LOCK:
+            stats = _LOCAL_STATS.setdefault(layer["path"], {
+                "queries": 0, "points": 0, "query_ms": 0.0,
+                "missing": 0, "errors": 0, "last_error": None,
+            })
         full = os.path.join(DISTRICTS_DIR, layer["path"])
-        if not os.path.exists(full):
-            out[layer["field"]] = None
+        if not (os.path.exists(full) or os.path.exists(_compiled_path(layer["path"]))):
+            with _LAYERS_LOCK:
+                stats["missing"] += 1
             continue
+        spec = LayerSpec(layer["path"], layer["path"], layer["attribute"])
+        t0 = time.perf_counter()
         try:
-            gdf = _read(layer["path"])
-            match = gdf[gdf.contains(point)]
-            if not match.empty and layer["attribute"] in match.columns:
-                out[layer["field"]] = str(match[layer["attribute"]].values[0])
-            else:
-                out[layer["field"]] = None
-        except Exception:
-            out[layer["field"]] = None
+            values = _resolve_layer(state, spec, points, rows, pre)
+        except Exception as e:
+            with _LAYERS_LOCK:
+                stats["errors"] += 1
+                stats["last_error"] = f"{type(e).__name__}: {e}"
+            log.warning("local layer %s failed: %s", layer["path"], e)
+            continue
+        with _LAYERS_LOCK:
+            stats["queries"] += 1
+            stats["points"] += len(rows)
+            stats["query_ms"] += (time.perf_counter() - t0) * 1000
+        column = out[layer["field"]]
+        for i, value in zip(rows, values):
+            column[i] = value
     return out
 
 
-def get_districts(lat, lon, state="GA"):
+def get_districts_batch(lats, lons, state="GA", engine="auto", timings=None):
+    """Resolve many points in one pass per layer.
+
+    `lats` / `lons` are equal-length sequences (NumPy arrays preferred). Returns
+    a columnar dict — field -> list, one entry per input point, in input order —
+    with the same fields get_districts returns. Sub-county columns are present
+    for every local layer registered for the state and None outside its county.
+
+    `engine`: "auto" answers from the state's grid, then its overlay, where
+    those are built, and falls back to per-layer indexes; "grid" / "overlay"
+    use just that one; "index" always runs the exact per-layer test.
+
+    `timings`, if given, is a dict that gets this call's milliseconds added
+    under "load" (reading layer and precomputed indexes) and "pip" (the
+    lookups themselves).
+    """
+    t0 = time.perf_counter()
+    load0 = getattr(_LOAD_CLOCK, "ms", 0.0)
     state = state.upper()
     if state not in SHAPEFILES:
         return {
             "error": f"State '{state}' not supported. Supported: {sorted(SHAPEFILES.keys())}"
         }
 
-    point = Point(lon, lat)  # Shapely is (x, y) = (lon, lat)
-    bundle = SHAPEFILES[state]
-
-    cong = _read(bundle["cong"])
-    senate = _read(bundle["upper"])
-    house = _read(bundle["lower"])
-    counties = _read_counties(state)
-
-    cong_match = cong[cong.contains(point)]
-    senate_match = senate[senate.contains(point)]
-    house_match = house[house.contains(point)]
-    county_match = counties[counties.contains(point)]
-
-    county_name = None
-    if not county_match.empty and "NAME" in county_match.columns:
-        county_name = county_match["NAME"].values[0]
-
-    cong_col = next(
-        (c for c in cong_match.columns if c.startswith("CD") and c.endswith("FP")),
-        None,
-    )
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    points = shapely.points(lons, lats)  # Shapely is (x, y) = (lon, lat)
+    rows = np.arange(len(points))
 
+    pre = _precompute(state, lons, lats, points, engine)
+    specs = {spec.name: spec for spec in layer_specs(state)}
+    counties = _resolve_layer(state, specs["county"], points, rows, pre)
     result = {
-        "state": state,
-        "congressional": (
-            str(cong_match[cong_col].values[0])
-            if (cong_col and not cong_match.empty)
-            else None
-        ),
-        "state_senate": (
-            str(senate_match["SLDUST"].values[0])
-            if (not senate_match.empty and "SLDUST" in senate_match.columns)
-            else None
-        ),
-        "state_assembly": (
-            str(house_match["SLDLST"].values[0])
-            if (not house_match.empty and "SLDLST" in house_match.columns)
-            else None
-        ),
-        "county": county_name,
+        "state": [state] * len(points),
+        "congressional": _resolve_layer(state, specs["cong"], points, rows, pre),
+        "state_senate": _resolve_layer(state, specs["upper"], points, rows, pre),
+        "state_assembly": _resolve_layer(state, specs["lower"], points, rows, pre),
+        "county": counties,
     }
 
     # Sub-county layers (commission district, city council ward, etc.) only
-    # run after we know which county we're in.
-    result.update(_resolve_local_layers(point, state, county_name))
+    # run after we know which county each point is in.
+    result.update(_resolve_local_layers(points, state, counties, pre))
+
+    if timings is not None:
+        load = _LOAD_CLOCK.ms - load0 if hasattr(_LOAD_CLOCK, "ms") else 0.0
+        timings["load"] = timings.get("load", 0.0) + load
+        timings["pip"] = timings.get("pip", 0.0) + (time.perf_counter() - t0) * 1000 - load
     return result
 
 
+def get_districts(lat, lon, state="GA", timings=None):
+    batch = get_districts_batch([lat], [lon], state, timings=timings)
+    if "error" in batch:
+        return batch
+
+    row = {field: values[0] for field, values in batch.items()}
+    # A single lookup only reports the sub-county fields that exist for its
+    # county, so drop the batch's placeholder columns for the other counties.
+    local = {layer["field"] for layer in _local_index()["by_state"].get(row["state"], [])}
+    keep = {layer["field"] for layer in _local_layers_for(row["state"], row["county"])}
+    return {k: v for k, v in row.items() if k not in local or k in keep}
+
+
 if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] in ("bulk", "serve"):
+        # Both modes import this module by name; hand them this instance
+        # rather than a second copy with its own layer registry.
+        sys.modules.setdefault("find_district", sys.modules[__name__])
+        if sys.argv[1] == "bulk":
+            from bulk_lookup import main as mode_main
+        else:
+            from lookup_server import main as mode_main
+        sys.exit(mode_main(sys.argv[2:]))
+
     if len(sys.argv) < 3:
         print(json.dumps({"error": "usage: find_district.py <lat> <lon> [state_code]"}))
         sys.exit(1)
@@ -0,0 +1,102 @@
+"""Fixed coordinate corpus for lookup benchmarks and engine checks.
+
+    python districts/lookup_corpus.py [--states GA NY] [--interior 200] [--boundary 200] [--seed 2024] > corpus.json
+
+Per state, `interior` points are drawn uniformly inside the congressional
+layer. `boundary` points are dropped a few meters to either side of a random
+spot on a random polygon edge, spread over every layer the state has on disk
+(cong, upper, lower, county and local layers): those are the points where a
+faster engine is most likely to disagree with the exact test. The same seed
+and the same layer files always give the same corpus, and fingerprint()
+identifies it in benchmark output so runs can be compared.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+import shapely
+
+import find_district as fd
+
+METERS_PER_DEGREE = 111_320.0
+
+
+def _geometries(state, spec):
+    """Every polygon of one layer, or None if the layer isn't on disk."""
+    if not (os.path.exists(os.path.join(fd.DISTRICTS_DIR, spec.path))
+            or os.path.exists(fd._compiled_path(spec.path, spec.where))):
+        return None
+    index = fd._layer(state, *spec)
+    index._materialize(range(len(index)))
+    return index.geometries
+
+
+def _interior(state, n, rng):
+    geoms = _geometries(state, fd.layer_specs(state)[0])  # cong covers the state
+    if geoms is None or not n:
+        return []
+    union = shapely.union_all(geoms)
+    shapely.prepare(union)
+    minx, miny, maxx, maxy = union.bounds
+    out = []
+    while len(out) < n:
+        xs = rng.uniform(minx, maxx, n * 2)
+        ys = rng.uniform(miny, maxy, n * 2)
+        inside = shapely.contains_xy(union, xs, ys)
+        out += [(y, x) for x, y in zip(xs[inside], ys[inside])]
+    return [{"state": state, "lat": lat, "lon": lon, "kind": "interior"} for lat, lon in out[:n]]
+
+
+def _boundary(state, n, rng, offset_m):
+    layers = [(spec.name, g) for spec in fd.layer_specs(state) if (g := _geometries(state, spec)) is not None]
+    if not layers:
+        return []
+    out = []
+    for k in range(n):
+        name, geoms = layers[k % len(layers)]
+        edge = shapely.boundary(geoms[rng.integers(len(geoms))])
+        on = shapely.line_interpolate_point(edge, rng.uniform(), normalized=True)
+        angle = rng.uniform(0, 2 * math.pi)
+        dlat = offset_m * math.sin(angle) / METERS_PER_DEGREE
+        dlon = offset_m * math.cos(angle) / (METERS_PER_DEGREE * math.cos(math.radians(on.y)))
+        out.append({"state": state, "lat": on.y + dlat, "lon": on.x + dlon, "kind": f"boundary:{name}"})
+    return out
+
+
+def corpus(states=("GA", "NY"), interior=200, boundary=200, seed=2024, offset_m=3.0):
+    """List of {"state", "lat", "lon", "kind"} dicts, deterministic for a seed."""
+    rng = np.random.default_rng(seed)
+    points = []
+    for state in states:
+        points += _interior(state, interior, rng)
+        points += _boundary(state, boundary, rng, offset_m)
+    for p in points:
+        p["lat"], p["lon"] = round(float(p["lat"]), 7), round(float(p["lon"]), 7)
+    return points
+
+
+def fingerprint(points):
+    return hashlib.sha256(json.dumps(points, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def add_arguments(ap):
+    """Corpus options shared by the scripts that use it."""
+    ap.add_argument("--states", nargs="*", default=["GA", "NY"])
+    ap.add_argument("--interior", type=int, default=200, help="random interior points per state")
+    ap.add_argument("--boundary", type=int, default=200, help="near-boundary points per state")
+    ap.add_argument("--offset-m", type=float, default=3.0, help="boundary point distance from the edge")
+    ap.add_argument("--seed", type=int, default=2024)
+
+
+def from_args(args):
+    return corpus([s.upper() for s in args.states], args.interior, args.boundary, args.seed, args.offset_m)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(ap)
+    print(json.dumps(from_args(ap.parse_args())))
@@ -0,0 +1,129 @@
+"""Long-lived district lookup server: load the indexes once, answer many lookups.
+
+    python districts/find_district.py serve                     # JSONL on stdin/stdout
+    python districts/find_district.py serve --socket /tmp/otp-districts.sock
+
+One JSON object per line in, one per line out. A lookup request is
+    {"lat": 34.30, "lon": -83.82, "state": "GA"}
+and gets back exactly what get_districts returns (or {"error": ...}). Send
+    {"op": "stats"}
+for request counts, latency percentiles, the layer registry's load stats, the
+grid/overlay hit rates (precomputed) and the LOCAL_LAYERS counters (local).
+
+Admin scripts that used to shell out once per point can keep one of these
+running and pay only for the lookup itself:
+    printf '{"lat": 34.3, "lon": -83.8}\\n' | nc -U /tmp/otp-districts.sock
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+
+import find_district as fd
+
+# Latency percentiles are taken over the most recent lookups only.
+LATENCY_WINDOW = 10000
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, ms, ok):
+        with self._lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self.latencies_ms.append(ms)
+
+    def snapshot(self):
+        with self._lock:
+            window = sorted(self.latencies_ms)
+        pct = lambda p: round(window[min(len(window) - 1, int(p / 100 * len(window)))], 3) if window else None
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ms": {"p50": pct(50), "p90": pct(90), "p99": pct(99), "max": pct(100)},
+            "layers": fd.layer_stats(),
+            "precomputed": fd.precomputed_stats(),
+            "local": fd.local_layer_stats(),
+        }
+
+
+def handle_line(line, stats):
+    """One request line in, one response dict out."""
+    try:
+        req = json.loads(line)
+    except json.JSONDecodeError:
+        return {"error": "invalid JSON"}
+    if not isinstance(req, dict):
+        return {"error": "expected a JSON object"}
+    if req.get("op") == "stats":
+        return stats.snapshot()
+
+    t0 = time.perf_counter()
+    try:
+        result = fd.get_districts(float(req["lat"]), float(req["lon"]), req.get("state") or "GA")
+    except (KeyError, TypeError, ValueError):
+        result = {"error": "lat and lon are required numbers"}
+    except Exception as e:
+        result = {"error": f"District lookup failed: {e}"}
+    stats.record((time.perf_counter() - t0) * 1000, "error" not in result)
+    return result
+
+
+def serve_stdio(stats):
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        sys.stdout.write(json.dumps(handle_line(line, stats)) + "\n")
+        sys.stdout.flush()
+
+
+def serve_socket(path, stats):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                self.wfile.write((json.dumps(handle_line(line, stats)) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket from a previous run
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.daemon_threads = True
+        print(f"listening on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="find_district.py serve", description=__doc__.splitlines()[0])
+    ap.add_argument("--socket", help="listen on this Unix socket instead of stdin/stdout")
+    ap.add_argument("--states", nargs="*", help="states to preload (default: all supported)")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    loaded = fd.preload([s.upper() for s in args.states] if args.states else None)
+    print(f"preloaded {len(loaded)} layers in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+    stats = Stats()
+    if args.socket:
+        serve_socket(args.socket, stats)
+    else:
+        serve_stdio(stats)
+    return 0
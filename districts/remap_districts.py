@@ -0,0 +1,243 @@
+"""Carry stored user districts across a redistricting without re-geocoding.
+
+We never keep street addresses, so all we know about a user after TIGER
+replaces a layer is the tuple of districts they were resolved to
+(county, cong_district, state_senate_dist, state_house_dist, local districts).
+That tuple pins them to the region where all of those old polygons overlap.
+This tool builds those regions from the old layers and intersects each one
+with the new layers:
+
+- a region that falls (up to --sliver of its area, for edge realignment
+  noise) inside a single new district on every replaced layer is remapped
+  in bulk
+- a region split across new districts is ambiguous. Those users, and users
+  whose stored tuple doesn't occur in the old layers at all, have their
+  replaced-layer columns cleared along with districts_resolved_at, so no
+  ballot is matched against a district that no longer exists. Nothing
+  prompts them yet: their Profile shows those districts as "—" until they
+  save their address again, which re-resolves every column
+
+Usage (new layers are the ones registered in find_district.py; pass the old
+file for every layer that was replaced):
+    python districts/remap_districts.py GA --old cong=archive/tl_2022_13_cd118.shp \\
+        --old lower=archive/tl_2022_13_sldl.shp --out remap_GA.sql --report remap_GA.json
+
+Review the report, then run the SQL (one transaction) in the Supabase SQL editor.
+Layer names are cong, upper, lower, county, or a LOCAL_LAYERS path.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import find_district as fd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from _lookup import normalize_districts  # noqa: E402  (same column formatting as the lookup route)
+
+EQUAL_AREA = "EPSG:5070"   # CONUS Albers: area shares in m^2, not square degrees
+BASE_FIELDS = {"cong": "congressional", "upper": "state_senate", "lower": "state_assembly", "county": "county"}
+# get_districts field -> public.users column, as normalize_districts writes them.
+COLUMNS = {
+    "congressional": "cong_district",
+    "state_senate": "state_senate_dist",
+    "state_assembly": "state_house_dist",
+    "county": "county",
+    "county_commission": "county_commission_dist",
+    "city_council": "city_council_dist",
+    "school_board": "school_board_dist",
+}
+
+
+def _layers(state):
+    """[(layer name, get_districts field, LayerSpec, local?)] for every layer of `state`."""
+    out = []
+    for spec in fd.layer_specs(state):
+        if spec.name in BASE_FIELDS:
+            out.append((spec.name, BASE_FIELDS[spec.name], spec, False))
+    for layer in fd._local_index()["by_state"].get(state, []):
+        if layer["field"] in COLUMNS:
+            spec = fd.LayerSpec(layer["path"], layer["path"], layer["attribute"])
+            out.append((layer["path"], layer["field"], spec, True))
+    return out
+
+
+def _frame(path, column, where, field):
+    gdf = fd._read(path, where=where)
+    col = column(gdf.columns) if callable(column) else column
+    if col not in gdf.columns:
+        raise SystemExit(f"{path}: no {col or 'district'} column")
+    out = gdf[[col, "geometry"]].rename(columns={col: field})
+    out[field] = out[field].astype(str)
+    return out.to_crs(EQUAL_AREA)
+
+
+def _key(values):
+    return tuple(None if v != v else v for v in values)  # overlay/dissolve leave NaN for "no polygon"
+
+
+def _db_values(values):
+    """{users column: stored value} for {get_districts field: raw layer value}."""
+    row = normalize_districts(values)
+    return {COLUMNS[f]: row[COLUMNS[f]] for f in values}
+
+
+def remap(state, old_paths, sliver):
+    """Per old tuple: its stored values, and either new values or the competing candidates."""
+    import geopandas as gpd
+
+    layers = _layers(state)
+    unknown = set(old_paths) - {name for name, *_ in layers}
+    if unknown:
+        raise SystemExit(f"unknown layer(s) for {state}: {sorted(unknown)}")
+    fields = [field for _, field, _, _ in layers]
+    changed = [(name, field, spec) for name, field, spec, _ in layers if name in old_paths]
+
+    # Regions of the old map: every combination of old (or unchanged) districts.
+    cells = None
+    for name, field, spec, local in layers:
+        frame = _frame(old_paths.get(name, spec.path), spec.column,
+                       None if name in old_paths else spec.where, field)
+        print(f"  old {name}: {len(frame)} polygons", file=sys.stderr)
+        if cells is None:
+            cells = frame
+        else:
+            # Local layers cover one county; elsewhere their field stays None.
+            cells = gpd.overlay(cells, frame, how="identity" if local else "intersection", keep_geom_type=True)
+    cells = cells.dissolve(by=fields, as_index=False, dropna=False)
+    cells["area"] = cells.area
+
+    shares = {}   # (tuple, field) -> {new value: area}
+    for name, field, spec in changed:
+        new = _frame(spec.path, spec.column, spec.where, "new")
+        print(f"  new {name}: {len(new)} polygons", file=sys.stderr)
+        pieces = gpd.overlay(cells[[*fields, "geometry"]], new, how="intersection", keep_geom_type=True)
+        pieces["area"] = pieces.area
+        for row in pieces[[*fields, "new", "area"]].itertuples(index=False):
+            key = _key(row[:len(fields)])
+            by_value = shares.setdefault((key, field), {})
+            by_value[row[-2]] = by_value.get(row[-2], 0.0) + row[-1]
+
+    results = []
+    for row in cells[[*fields, "area"]].itertuples(index=False):
+        key, area = _key(row[:len(fields)]), row[-1]
+        old = dict(zip(fields, key))
+        new, candidates, ambiguous = dict(old), {}, False
+        for _, field, _ in changed:
+            by_value = shares.get((key, field), {})
+            total = sum(by_value.values())
+            ranked = sorted(by_value.items(), key=lambda kv: -kv[1])
+            candidates[field] = {v: round(a / total, 6) for v, a in ranked} if total else {}
+            if not ranked or ranked[0][1] < (1 - sliver) * total:
+                ambiguous = True
+            else:
+                new[field] = ranked[0][0]
+        results.append({
+            "old": _db_values(old),
+            "new": None if ambiguous else _db_values(new),
+            "ambiguous": ambiguous,
+            "area_km2": round(area / 1e6, 3),
+            "candidates": candidates,
+        })
+    return results, [COLUMNS[f] for f in fields], [COLUMNS[f] for _, f, _ in changed]
+
+
+def _q(value):
+    return "null" if value is None else "'" + str(value).replace("'", "''") + "'"
+
+
+def to_sql(state, results, key_columns, changed_columns):
+    """One transaction: clear unknown and ambiguous tuples, then remap the rest in one UPDATE."""
+    cols = ["state", *key_columns, *[f"new_{c}" for c in changed_columns], "ambiguous"]
+    rows = []
+    for r in results:
+        new = r["new"] or {}
+        values = [state, *[r["old"][c] for c in key_columns], *[new.get(c) for c in changed_columns]]
+        rows.append("  (" + ", ".join(_q(v) for v in values) + (", true)" if r["ambiguous"] else ", false)"))
+    match = " and ".join(f"u.{c} is not distinct from m.{c}" for c in key_columns)
+    sets = ",\n    ".join(f"{c} = m.new_{c}" for c in changed_columns)
+    clears = ", ".join(f"{c} = null" for c in changed_columns)
+    coldefs = ", ".join(f"{c} {'boolean' if c == 'ambiguous' else 'text'}" for c in cols)
+    values = ",\n".join(rows)
+    return f"""-- GENERATED by districts/remap_districts.py for {state}; review the report before running.
+-- Remaps users whose stored district tuple lies in a single new district on every
+-- replaced layer ({', '.join(changed_columns)}); everyone else in {state} whose
+-- tuple is ambiguous or unknown has those columns cleared until they re-enter
+-- their address, so get_my_ballot stops matching them against old districts.
+begin;
+
+create temp table _district_remap ({coldefs}) on commit drop;
+insert into _district_remap ({', '.join(cols)}) values
+{values};
+
+-- Tuples that don't occur in the old layers at all: can't be placed.
+update public.users u set {clears}, districts_resolved_at = null
+where u.state = {_q(state)} and u.districts_resolved_at is not null
+  and not exists (select 1 from _district_remap m where m.state = u.state and {match});
+
+-- Split by the new lines: unknown until the address is entered again.
+update public.users u set {clears}, districts_resolved_at = null
+from _district_remap m
+where m.ambiguous and u.state = m.state and {match};
+
+-- Everything else moves in one statement (matched against the pre-update rows,
+-- so a new tuple can never be remapped a second time).
+update public.users u set
+    {sets},
+    districts_resolved_at = now()
+from _district_remap m
+where not m.ambiguous and u.state = m.state and {match}
+  and u.districts_resolved_at is not null;
+
+commit;
+"""
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("state")
+    ap.add_argument("--old", action="append", default=[], metavar="LAYER=PATH",
+                    help="old file for a replaced layer (repeatable)")
+    ap.add_argument("--sliver", type=float, default=0.001,
+                    help="share of a region allowed outside its new district (default 0.001)")
+    ap.add_argument("--out", help="SQL output (default stdout)")
+    ap.add_argument("--report", help="per-tuple JSON report")
+    args = ap.parse_args(argv)
+
+    state = args.state.upper()
+    if state not in fd.SHAPEFILES:
+        raise SystemExit(f"State '{state}' not supported. Supported: {sorted(fd.SHAPEFILES)}")
+    old_paths = dict(item.split("=", 1) for item in args.old)
+    if not old_paths:
+        raise SystemExit("pass --old LAYER=PATH for at least one replaced layer")
+    old_paths = {name: os.path.abspath(path) for name, path in old_paths.items()}
+
+    results, key_columns, changed_columns = remap(state, old_paths, args.sliver)
+    sql = to_sql(state, results, key_columns, changed_columns)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(sql)
+    else:
+        sys.stdout.write(sql)
+
+    ambiguous = [r for r in results if r["ambiguous"]]
+    moved = [r for r in results if not r["ambiguous"] and r["new"] != r["old"]]
+    summary = {
+        "state": state,
+        "replaced": changed_columns,
+        "tuples": len(results),
+        "remapped": len(moved),
+        "unchanged": len(results) - len(moved) - len(ambiguous),
+        "ambiguous": len(ambiguous),
+        "ambiguous_area_share": round(sum(r["area_km2"] for r in ambiguous) / (sum(r["area_km2"] for r in results) or 1), 4),
+    }
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "tuples": results}, f, indent=2)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
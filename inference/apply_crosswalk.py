@@ -7,13 +7,46 @@ never trust a stored roll-call number. Emits a report + a rep_positions upsert S
 
 Usage: python inference/apply_crosswalk.py            # defaults to Clyde
        python inference/apply_crosswalk.py C001116 20 "Clyde, Andrew"
+       python inference/apply_crosswalk.py --delegation ga_delegation.json [out.sql]
+
+--delegation takes [{"bioguide": "C001116", "rep_id": 20, "name": "Clyde, Andrew"}, ...]
+and resolves every member in one pass: each bill's roll call and cosponsor list
+is fetched and parsed once, then read for all of them. One SQL file covers the
+whole delegation (default inference/_delegation_crosswalk.sql).
+
+HTTP responses are cached on disk (inference/.http_cache/, one file per URL
+hash, the api_key never part of the key). Clerk roll-call XML is final once
+published and never expires; Congress.gov actions/sponsors/cosponsors are
+refetched after CROSSWALK_CACHE_TTL seconds (default 1 day, 0 = always).
+
+Crosswalk entries are fetched concurrently (CROSSWALK_WORKERS, default 4) under
+one shared token bucket per host: CROSSWALK_RPS (default 1.3/s, just under
+Congress.gov's 5,000 requests/hour, after a CROSSWALK_BURST of 60) for the
+API, a polite 5/s for the Clerk.
+429s, 5xx and network errors back off exponentially (honoring Retry-After).
+Results are still applied in crosswalk order, so the report, the ranking and
+the SQL don't depend on which fetch finished first.
+
+When the roll-call warehouse exists (inference/rollcall_warehouse.py sync;
+CROSSWALK_WAREHOUSE), roll calls are read from it instead: rolls it already
+holds are never fetched or parsed again, bill -> roll mappings younger than
+CROSSWALK_CACHE_TTL skip the actions lookup, anything fetched live is filed
+there, and every member's vote on every bill comes back from one indexed join.
 """
-import os, sys, re, json, time, urllib.request, xml.etree.ElementTree as ET
+import os, io, sys, re, json, time, random, hashlib, threading, urllib.error, urllib.parse, urllib.request, xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+import rollcall_warehouse as wh
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-BIOGUIDE = sys.argv[1] if len(sys.argv) > 1 else "C001116"
-REP_ID   = int(sys.argv[2]) if len(sys.argv) > 2 else 20
-NAME     = sys.argv[3] if len(sys.argv) > 3 else "Clyde, Andrew"
+if len(sys.argv) > 2 and sys.argv[1] == '--delegation':
+    MEMBERS = [(m['bioguide'], int(m['rep_id']), m.get('name') or m['bioguide'])
+               for m in json.load(open(sys.argv[2], encoding='utf-8'))]
+    OUT = os.path.abspath(sys.argv[3]) if len(sys.argv) > 3 else os.path.join('inference', '_delegation_crosswalk.sql')
+else:
+    MEMBERS = [(sys.argv[1] if len(sys.argv) > 1 else "C001116",
+                int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+                sys.argv[3] if len(sys.argv) > 3 else "Clyde, Andrew")]
+    OUT = os.path.join('inference', '_clyde_crosswalk.sql')
 
 KEY = None
 for line in open(os.path.join(ROOT, '.env'), encoding='utf-8'):
@@ -25,22 +58,74 @@ BTYPE = {'H.R.': 'hr', 'H.J.Res.': 'hjres', 'H.Con.Res.': 'hconres', 'S.': 's'}
 INC = re.compile(r'on passage|agree to the senate amendment|suspend the rules and pass|passed/agreed to|on motion to concur', re.I)
 EXC = re.compile(r'motion to table|reconsider|previous question|recommit|ordered|quorum|adjourn', re.I)
 
-def api(path):
-    url = f"https://api.congress.gov/v3/{path}" + ('&' if '?' in path else '?') + 'api_key=' + KEY
-    for attempt in range(3):
+CACHE_DIR = os.environ.get('CROSSWALK_CACHE_DIR', os.path.join(ROOT, 'inference', '.http_cache'))
+CACHE_TTL = float(os.environ.get('CROSSWALK_CACHE_TTL', 24 * 3600))
+WORKERS = int(os.environ.get('CROSSWALK_WORKERS', 4))
+cache_stats = {'hit': 0, 'fetched': 0, 'retried': 0}
+stats_lock = threading.Lock()
+
+class TokenBucket:
+    """Shared pacing: take() blocks until the caller's slot (reservations may queue)."""
+    def __init__(self, rate, burst):
+        self.rate, self.burst, self.tokens, self.stamp = rate, burst, burst, time.monotonic()
+        self.lock = threading.Lock()
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate)
+        time.sleep(wait)
+
+BUCKETS = {'api.congress.gov': TokenBucket(float(os.environ.get('CROSSWALK_RPS', 1.3)),
+                                           float(os.environ.get('CROSSWALK_BURST', 60))),
+           'clerk.house.gov': TokenBucket(5.0, 5)}
+RETRY = {429, 500, 502, 503, 504}
+
+def count(stat):
+    with stats_lock:
+        cache_stats[stat] += 1
+
+def fetch(url, ttl, key=None):
+    """Body of url, from the disk cache when fresh. ttl=None: cached forever.
+    `key` (the api_key) is added on the wire only, so it never reaches the cache."""
+    h = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    path = os.path.join(CACHE_DIR, h[:2], h)
+    if os.path.exists(path) and (ttl is None or time.time() - os.path.getmtime(path) < ttl):
+        count('hit')
+        return open(path, 'rb').read()
+    wire = url + (('&' if '?' in url else '?') + 'api_key=' + key if key else '')
+    bucket = BUCKETS.get(urllib.parse.urlparse(url).hostname)
+    for attempt in range(6):
+        if bucket: bucket.take()
         try:
-            with urllib.request.urlopen(urllib.request.Request(url, headers={'User-Agent': 'otp-crosswalk'}), timeout=30) as r:
-                return json.load(r)
-        except Exception as e:
-            if attempt == 2: raise
-            time.sleep(1.5)
+            with urllib.request.urlopen(urllib.request.Request(wire, headers={'User-Agent': 'otp-crosswalk'}), timeout=30) as r:
+                body = r.read()
+            break
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            status = getattr(e, 'code', None)  # HTTPError has one; network errors don't
+            if attempt == 5 or (status is not None and status not in RETRY): raise
+            retry_after = e.headers.get('Retry-After') if status else None
+            count('retried')
+            time.sleep(float(retry_after) if retry_after and retry_after.isdigit()
+                       else min(60.0, 1.5 * 2 ** attempt) * random.uniform(0.75, 1.25))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    open(tmp, 'wb').write(body)
+    os.replace(tmp, path)  # atomic: a crashed run never leaves half a response behind
+    count('fetched')
+    return body
+
+def api(path):
+    return json.loads(fetch(f"https://api.congress.gov/v3/{path}", CACHE_TTL, key=KEY))
 
 def billparts(bill, congress):
     m = re.match(r'(H\.R\.|H\.J\.Res\.|H\.Con\.Res\.|S\.)\s*(\d+)', bill)
     return BTYPE[m.group(1)], m.group(2)
 
-def resolve_vote(congress, bt, num):
-    """Return (vote, roll, url) for the member on the bill's final House passage, or None."""
+def final_roll(congress, bt, num):
+    """The bill's final House passage vote as {'date','text','roll','url'}, or None."""
     d = api(f"bill/{congress}/{bt}/{num}/actions?format=json&limit=250")
     cands = []
     for a in d.get('actions', []):
@@ -53,76 +138,146 @@ def resolve_vote(congress, bt, num):
     if not pool:
         return None
     pool.sort(key=lambda c: (c['date'], c['roll'] or 0))
-    chosen = pool[-1]
+    return pool[-1]
+
+WANTED = {bg for bg, _, _ in MEMBERS}
+
+def resolve_votes(congress, bt, num):
+    """(roll, url, {bioguide: vote}) for the bill's final House passage, or None.
+    One parse of the Clerk XML serves every member; absent = not in office / didn't vote.
+    The XML is streamed and each recorded-vote dropped once read, and the parse stops
+    as soon as every member in WANTED has been seen."""
+    chosen = final_roll(congress, bt, num)
+    if not chosen:
+        return None
+    votes = {}
     try:
-        with urllib.request.urlopen(urllib.request.Request(chosen['url'], headers={'User-Agent': 'otp-crosswalk'}), timeout=30) as r:
-            root = ET.fromstring(r.read())
+        body = fetch(chosen['url'], None)  # a recorded roll call never changes
+        for _, rv in ET.iterparse(io.BytesIO(body)):
+            if rv.tag != 'recorded-vote':
+                continue
+            leg = rv.find('legislator')
+            if leg is not None and leg.get('name-id') in WANTED:
+                votes[leg.get('name-id')] = rv.find('vote').text
+                if len(votes) == len(WANTED):
+                    break
+            rv.clear()
     except Exception:
         return None
-    for rv in root.iter('recorded-vote'):
-        leg = rv.find('legislator')
-        if leg is not None and leg.get('name-id') == BIOGUIDE:
-            return (rv.find('vote').text, chosen['roll'], chosen['url'])
-    return None  # member not in this vote (not in office / didn't vote)
+    return chosen['roll'], chosen['url'], votes
+
+WAREHOUSE = wh.connect() if os.path.exists(wh.DB_PATH) else None
+MAPPED = wh.bill_rolls(WAREHOUSE, CACHE_TTL) if WAREHOUSE else {}
+FILED = wh.synced_rolls(WAREHOUSE) if WAREHOUSE else set()
+
+def stage_roll(congress, bt, num):
+    """Warehouse mode: (chosen, Clerk XML or None if already filed or unreachable), or None.
+    Stored by the main thread. A failed fetch reads as no votes, as in resolve_votes()."""
+    chosen = MAPPED.get((congress, bt, str(num))) or final_roll(congress, bt, num)
+    if not chosen:
+        return None
+    if wh.roll_id(chosen['url']) in FILED:
+        return chosen, None
+    try:
+        return chosen, fetch(chosen['url'], None)
+    except Exception:
+        return chosen, None
 
-def is_sponsor(congress, bt, num):
+def sponsors(congress, bt, num):
+    """Bioguide IDs of the bill's sponsors and cosponsors."""
     d = api(f"bill/{congress}/{bt}/{num}?format=json")
-    for s in d.get('bill', {}).get('sponsors', []) or []:
-        if s.get('bioguideId') == BIOGUIDE: return True
     c = api(f"bill/{congress}/{bt}/{num}/cosponsors?format=json&limit=250")
-    for s in c.get('cosponsors', []) or []:
-        if s.get('bioguideId') == BIOGUIDE: return True
-    return False
+    return ({s.get('bioguideId') for s in d.get('bill', {}).get('sponsors', []) or []}
+            | {s.get('bioguideId') for s in c.get('cosponsors', []) or []})
 
 xwalk = json.load(open(os.path.join(ROOT, 'inference', 'crosswalk_national.json'), encoding='utf-8'))
-by_issue = {}
-report = []
+by_issue = {bg: {} for bg, _, _ in MEMBERS}
+report = {bg: [] for bg, _, _ in MEMBERS}
+# prefer roll_call over sponsorship, then higher confidence
+rank = lambda r: (1 if r['kind'] == 'roll_call' else 0, r['conf'])
+def bill_key(e):
+    return (e['congress'], *billparts(e['bill'], e['congress']), e['evidence_kind'])
+
+def gather(key):
+    """Network half of one bill: the roll call's votes, or the sponsor set."""
+    congress, bt, num, kind = key
+    if kind == 'roll_call':
+        return stage_roll(congress, bt, num) if WAREHOUSE else resolve_votes(congress, bt, num)
+    return sponsors(congress, bt, num)
+
+# Several entries can back onto one bill (H.R.1 of the 119th backs three issues):
+# resolve each (congress, type, number) once and share the answer.
+keys = list(dict.fromkeys(bill_key(e) for e in xwalk))
+with ThreadPoolExecutor(max_workers=WORKERS) as workers:
+    resolved = dict(zip(keys, workers.map(gather, keys)))
+
+if WAREHOUSE:
+    staged = {k: v for k, v in resolved.items() if k[3] == 'roll_call' and v}
+    for (congress, bt, num, _), (chosen, body) in staged.items():
+        if (congress, bt, num) not in MAPPED:
+            wh.record_bill_roll(WAREHOUSE, congress, bt, num, chosen)
+        if body is not None:
+            try:
+                wh.store_roll(WAREHOUSE, body, chosen['url'])
+            except Exception:
+                pass  # unreadable XML: no votes, as resolve_votes() would say
+    WAREHOUSE.commit()
+    votes = wh.member_votes(WAREHOUSE, WANTED)
+    for key, (chosen, _) in staged.items():
+        resolved[key] = (chosen['roll'], chosen['url'], votes.get(key[:3], {}))
+
 for e in xwalk:
     bt, num = billparts(e['bill'], e['congress'])
-    res = None
-    if e['evidence_kind'] == 'roll_call':
-        rv = resolve_vote(e['congress'], bt, num)
-        if rv:
-            vote, roll, url = rv
-            v = vote.strip().lower()
-            if v in ('yea', 'aye', 'yes'):
-                pv = e['yea_means']
-            elif v in ('nay', 'no'):
-                pv = 'no' if e['yea_means'] == 'yes' else 'yes'
+    rolled = backers = resolved[bill_key(e)]
+    for bg, _, _ in MEMBERS:
+        res = None
+        if e['evidence_kind'] == 'roll_call':
+            vote = rolled[2].get(bg) if rolled else None
+            if vote:
+                roll, url = rolled[0], rolled[1]
+                v = vote.strip().lower()
+                if v in ('yea', 'aye', 'yes'):
+                    pv = e['yea_means']
+                elif v in ('nay', 'no'):
+                    pv = 'no' if e['yea_means'] == 'yes' else 'yes'
+                else:
+                    pv = None  # Present / Not Voting
+                if pv:
+                    res = {'pv': pv, 'conf': e['base_confidence'], 'str': e['base_strength'],
+                           'quote': f"Voted {vote} on {e['bill']} ({e['name']}), House roll call {roll} ({e['congress']}th Congress).",
+                           'url': url, 'kind': 'roll_call'}
+                status = f"voted {vote} -> {pv or 'skip(present/NV)'}"
+            else:
+                status = "no recorded vote / not in office"
+        else:  # sponsorship
+            if bg in backers:
+                res = {'pv': e['yea_means'], 'conf': e['base_confidence'], 'str': e['base_strength'],
+                       'quote': f"Cosponsored {e['bill']} ({e['name']}) ({e['congress']}th Congress).",
+                       'url': f"https://www.congress.gov/bill/{e['congress']}th-congress/{ {'hr':'house-bill','hjres':'house-joint-resolution','hconres':'house-concurrent-resolution','s':'senate-bill'}[bt] }/{num}",
+                       'kind': 'sponsorship'}
+                status = f"cosponsored -> {e['yea_means']}"
             else:
-                pv = None  # Present / Not Voting
-            if pv:
-                res = {'pv': pv, 'conf': e['base_confidence'], 'str': e['base_strength'],
-                       'quote': f"Voted {vote} on {e['bill']} ({e['name']}), House roll call {roll} ({e['congress']}th Congress).",
-                       'url': url, 'kind': 'roll_call'}
-            status = f"voted {vote} -> {pv or 'skip(present/NV)'}"
-        else:
-            status = "no recorded vote / not in office"
-    else:  # sponsorship
-        if is_sponsor(e['congress'], bt, num):
-            res = {'pv': e['yea_means'], 'conf': e['base_confidence'], 'str': e['base_strength'],
-                   'quote': f"Cosponsored {e['bill']} ({e['name']}) ({e['congress']}th Congress).",
-                   'url': f"https://www.congress.gov/bill/{e['congress']}th-congress/{ {'hr':'house-bill','hjres':'house-joint-resolution','hconres':'house-concurrent-resolution','s':'senate-bill'}[bt] }/{num}",
-                   'kind': 'sponsorship'}
-            status = f"cosponsored -> {e['yea_means']}"
-        else:
-            status = "not a (co)sponsor -> skip"
-    report.append({'issue': e['issue_id'], 'bill': e['bill'], 'kind': e['evidence_kind'], 'status': status})
-    if res:
-        cur = by_issue.get(e['issue_id'])
-        # prefer roll_call over sponsorship, then higher confidence
-        rank = lambda r: (1 if r['kind'] == 'roll_call' else 0, r['conf'])
-        if cur is None or rank(res) > rank(cur):
-            by_issue[e['issue_id']] = res
-    time.sleep(0.3)
+                status = "not a (co)sponsor -> skip"
+        report[bg].append({'issue': e['issue_id'], 'bill': e['bill'], 'kind': e['evidence_kind'], 'status': status})
+        if res:
+            cur = by_issue[bg].get(e['issue_id'])
+            if cur is None or rank(res) > rank(cur):
+                by_issue[bg][e['issue_id']] = res
 
 # emit SQL
 esc = lambda s: s.replace("'", "''")
 rows = []
-for iid, r in sorted(by_issue.items()):
-    rows.append(f"  ({REP_ID}, {iid}, '{r['pv']}', {r['str']}::smallint, {r['conf']}, "
-                f"'{esc(r['quote'])}', '{esc(r['url'])}')")
-sql = (f"-- Clyde ({NAME}, rep {REP_ID}) — crosswalk-applied positions ({len(rows)} issues)\n"
+for bg, rep_id, _ in MEMBERS:
+    for iid, r in sorted(by_issue[bg].items()):
+        rows.append(f"  ({rep_id}, {iid}, '{r['pv']}', {r['str']}::smallint, {r['conf']}, "
+                    f"'{esc(r['quote'])}', '{esc(r['url'])}')")
+if len(MEMBERS) == 1:
+    bg, rep_id, name = MEMBERS[0]
+    title = f"-- Clyde ({name}, rep {rep_id}) — crosswalk-applied positions ({len(rows)} issues)\n"
+else:
+    title = (f"-- Delegation ({len(MEMBERS)} members: {'; '.join(n for _, _, n in MEMBERS)})"
+             f" — crosswalk-applied positions ({len(rows)} rows)\n")
+sql = (title +
        "-- Reconciliation: fill gaps + overwrite existing ONLY when the crosswalk is stronger\n"
        "-- (or the existing row is not a clear yes/no). Never downgrades a solid prior position.\n"
        "insert into public.rep_positions\n"
@@ -136,10 +291,15 @@ sql = (f"-- Clyde ({NAME}, rep {REP_ID}) — crosswalk-applied positions ({len(r
        "  supporting_quote=excluded.supporting_quote, source_url=excluded.source_url, model=excluded.model, inferred_at=excluded.inferred_at\n"
        "where public.rep_positions.predicted_vote not in ('yes','no')\n"
        "   or coalesce(excluded.confidence,0) > coalesce(public.rep_positions.confidence,0);\n")
-open(os.path.join(ROOT, 'inference', '_clyde_crosswalk.sql'), 'w', encoding='utf-8', newline='\n').write(sql)
+open(os.path.join(ROOT, OUT), 'w', encoding='utf-8', newline='\n').write(sql)
 
-print(f"=== {NAME} ({BIOGUIDE}) crosswalk resolution ===")
-for r in report:
-    print(f"  [{r['issue']:3}] {r['bill']:13} {r['kind']:11} {r['status']}")
-print(f"\nResolved positions: {len(by_issue)} issues -> {sorted(by_issue)}")
-print("SQL written to inference/_clyde_crosswalk.sql")
+for bg, rep_id, name in MEMBERS:
+    print(f"=== {name} ({bg}) crosswalk resolution ===")
+    for r in report[bg]:
+        print(f"  [{r['issue']:3}] {r['bill']:13} {r['kind']:11} {r['status']}")
+    print(f"\nResolved positions: {len(by_issue[bg])} issues -> {sorted(by_issue[bg])}")
+print(f"SQL written to {OUT.replace(os.sep, '/')}")
+print(f"HTTP cache: {cache_stats['hit']} hits, {cache_stats['fetched']} fetched, "
+      f"{cache_stats['retried']} retries ({CACHE_DIR})")
+if WAREHOUSE:
+    print(f"Roll-call warehouse: {len(FILED)} rolls held, {len(MAPPED)} bill mappings reused ({wh.DB_PATH})")
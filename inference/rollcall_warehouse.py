@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Local warehouse of House roll calls (SQLite), synced incrementally from the Clerk.
+
+One row per (year, roll, member, vote), plus the bill -> final-passage-roll
+mapping apply_crosswalk.py resolves from Congress.gov actions. Once a roll is
+in here nothing asks the network about it again, and every member's vote on
+every crosswalk bill is one indexed join (member_votes()).
+
+Usage: python inference/rollcall_warehouse.py sync [YEAR ...]   # default: this year and last
+       python inference/rollcall_warehouse.py stats
+
+`sync` picks up each year at the roll after the last one synced and stops at
+the first roll the Clerk hasn't published yet, so a re-run costs a request or
+two. apply_crosswalk.py uses the warehouse whenever the file exists
+(CROSSWALK_WAREHOUSE, default inference/rollcalls.sqlite), and files any roll
+or bill mapping it had to fetch live.
+"""
+import os, re, sys, time, sqlite3, datetime, urllib.error, urllib.request, xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.environ.get('CROSSWALK_WAREHOUSE', os.path.join(ROOT, 'inference', 'rollcalls.sqlite'))
+CLERK = "https://clerk.house.gov/evs/{year}/roll{roll:03d}.xml"
+ROLL_URL = re.compile(r'/evs/(\d{4})/roll(\d+)\.xml', re.I)
+
+SCHEMA = """
+create table if not exists rolls (
+  year integer not null, roll integer not null, congress integer, session text,
+  legis_num text, question text, result text, action_date text, url text,
+  primary key (year, roll));
+create table if not exists votes (
+  year integer not null, roll integer not null, bioguide text not null, vote text,
+  primary key (year, roll, bioguide)) without rowid;
+create index if not exists votes_member on votes (bioguide, year, roll);
+create table if not exists bill_rolls (
+  congress integer not null, bill_type text not null, bill_number text not null,
+  year integer not null, roll integer not null, url text, action_date text, action_text text,
+  resolved_at real not null, primary key (congress, bill_type, bill_number));
+create table if not exists sync_state (year integer primary key, last_roll integer not null, synced_at text);
+"""
+
+def connect(path=DB_PATH):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+def roll_id(url):
+    """(year, roll) from a Clerk roll-call URL, or None."""
+    m = ROLL_URL.search(url or '')
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+def store_roll(db, body, url):
+    """Parse one Clerk roll-call XML document into rolls + votes. Returns (year, roll)."""
+    year, roll = roll_id(url)
+    root = ET.fromstring(body)
+    meta = root.find('vote-metadata')
+    text = lambda tag: (meta.findtext(tag) or '').strip() if meta is not None else ''
+    db.execute("insert or replace into rolls values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+               (year, roll, int(text('congress') or 0) or None, text('session'), text('legis-num'),
+                text('vote-question'), text('vote-result'), text('action-date'), url))
+    rows = []
+    for rv in root.iter('recorded-vote'):
+        leg = rv.find('legislator')
+        if leg is not None and leg.get('name-id'):
+            rows.append((year, roll, leg.get('name-id'), (rv.findtext('vote') or '').strip()))
+    db.execute("delete from votes where year = ? and roll = ?", (year, roll))
+    db.executemany("insert into votes values (?, ?, ?, ?)", rows)
+    return year, roll
+
+def synced_rolls(db):
+    return set(db.execute("select year, roll from rolls"))
+
+def bill_rolls(db, max_age=None):
+    """{(congress, bill_type, bill_number): {'date','text','roll','url'}}, as final_roll() returns it.
+    A bill can still pick up a later passage vote, so mappings older than max_age seconds are left out."""
+    since = 0 if max_age is None else time.time() - max_age
+    return {(c, bt, num): {'date': date, 'text': text, 'roll': roll, 'url': url}
+            for c, bt, num, roll, url, date, text in
+            db.execute("select congress, bill_type, bill_number, roll, url, action_date, action_text "
+                       "from bill_rolls where resolved_at >= ?", (since,))}
+
+def record_bill_roll(db, congress, bt, num, chosen):
+    rid = roll_id(chosen['url'])
+    if rid is None:
+        return
+    db.execute("insert or replace into bill_rolls values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+               (congress, bt, str(num), *rid, chosen['url'], chosen['date'], chosen['text'], time.time()))
+
+def member_votes(db, bioguides):
+    """{(congress, bill_type, bill_number): {bioguide: vote}} for every mapped bill, one join."""
+    marks = ",".join("?" * len(bioguides))
+    out = {}
+    for c, bt, num, bg, vote in db.execute(
+            f"select b.congress, b.bill_type, b.bill_number, v.bioguide, v.vote "
+            f"from bill_rolls b join votes v on v.year = b.year and v.roll = b.roll "
+            f"where v.bioguide in ({marks})", list(bioguides)):
+        out.setdefault((c, bt, num), {})[bg] = vote
+    return out
+
+def _get(url):
+    """Body of url, or None once the Clerk says the roll doesn't exist (yet)."""
+    for attempt in range(4):
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers={'User-Agent': 'otp-crosswalk'}), timeout=30) as r:
+                return r.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404: return None
+            if attempt == 3 or e.code not in (429, 500, 502, 503, 504): raise
+        except (urllib.error.URLError, TimeoutError, ConnectionError):
+            if attempt == 3: raise
+        time.sleep(1.5 * 2 ** attempt)
+
+def sync(db, year):
+    """Fetch the year's rolls after the last synced one; returns how many were added."""
+    row = db.execute("select last_roll from sync_state where year = ?", (year,)).fetchone()
+    roll, added = (row[0] if row else 0) + 1, 0
+    while True:
+        url = CLERK.format(year=year, roll=roll)
+        body = _get(url)
+        if body is None:
+            break
+        try:
+            store_roll(db, body, url)
+        except ET.ParseError:
+            break  # an HTML "not found" page: the year ends here
+        db.execute("insert or replace into sync_state values (?, ?, ?)",
+                   (year, roll, datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')))
+        db.commit()
+        added += 1
+        roll += 1
+        time.sleep(0.2)  # polite to the Clerk
+    return added
+
+if __name__ == '__main__':
+    cmd = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    db = connect()
+    if cmd == 'sync':
+        this_year = datetime.date.today().year
+        for year in [int(y) for y in sys.argv[2:]] or [this_year - 1, this_year]:
+            print(f"{year}: +{sync(db, year)} rolls")
+    elif cmd != 'stats':
+        sys.exit(__doc__)
+    for year, last, at in db.execute("select year, last_roll, synced_at from sync_state order by year"):
+        print(f"  {year}: through roll {last} (synced {at})")
+    n_rolls, n_votes, n_bills = (db.execute(f"select count(*) from {t}").fetchone()[0] for t in ('rolls', 'votes', 'bill_rolls'))
+    print(f"{n_rolls} rolls, {n_votes} member votes, {n_bills} bill->roll mappings in {DB_PATH}")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""End-to-end latency benchmark for api/lookup-districts.py.
+
+    python scripts/bench_lookup.py [--geocode-latency-ms 80] [--concurrency 1 4 16] [--out bench.json]
+
+Runs the real `handler` class in-process on a local HTTP server, with
+Nominatim replaced by a stub that answers after a configurable delay. Every
+request is a normal POST; the stub maps its street ("BENCH-<i>") back to
+point i of the fixed GA/NY corpus from districts/lookup_corpus.py (interior
+points plus points a few meters off district and county lines). The TIGER
+address index and the geocode cache are switched off so each request really
+geocodes (pass --cache to measure with the cache on).
+
+Measured:
+- cold: fresh subprocesses that import the handler and serve one request
+  (import time, first and second request latency, Server-Timing stages,
+  child peak RSS)
+- warm: sequential latency over the corpus for POST and for the coordinate
+  GET, with per-stage Server-Timing medians
+- throughput: requests/second and latency at each --concurrency level
+- peak RSS of this process (server, stub and clients together)
+
+Results are one JSON document, tagged with the git commit and the corpus
+fingerprint, so runs on different commits can be diffed.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "districts"))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+
+def pct(values, p):
+    window = sorted(values)
+    return round(window[min(len(window) - 1, int(p / 100 * len(window)))], 3) if window else None
+
+
+def summary(ms):
+    return {
+        "n": len(ms),
+        "mean": round(sum(ms) / len(ms), 3) if ms else None,
+        "p50": pct(ms, 50), "p90": pct(ms, 90), "p99": pct(ms, 99), "max": pct(ms, 100),
+    }
+
+
+def start_stub(points, latency_ms):
+    """Fake Nominatim: "BENCH-<i>, ..." -> point i after `latency_ms`."""
+    class Stub(BaseHTTPRequestHandler):
+        def do_GET(self):
+            q = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query).get("q", [""])[0]
+            time.sleep(latency_ms / 1000)
+            rows = []
+            if q.startswith("BENCH-"):
+                p = points[int(q.split(",")[0][6:]) % len(points)]
+                rows = [{"lat": str(p["lat"]), "lon": str(p["lon"])}]
+            body = json.dumps(rows).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def configure_env(stub_url, cache):
+    os.environ["NOMINATIM_URL"] = stub_url
+    os.environ["NOMINATIM_RPS"] = "100000"          # the stub has no usage policy
+    os.environ["TIGER_ADDRESS_DB"] = os.devnull + ".missing"
+    if not cache:
+        os.environ["GEOCODE_CACHE_SIZE"] = "0"
+        os.environ.pop("GEOCODE_CACHE_DB", None)
+
+
+def load_handler(districts_dir=None):
+    if districts_dir:
+        import find_district
+        find_district.DISTRICTS_DIR = districts_dir
+    spec = importlib.util.spec_from_file_location("lookup_districts", os.path.join(ROOT, "api", "lookup-districts.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    class Quiet(module.handler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Quiet)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def request(base, i, point, method="POST"):
+    """(status, ms, Server-Timing stages) for one lookup of corpus point i."""
+    if method == "POST":
+        body = {"street_address": f"BENCH-{i}", "city": "Bench", "state": point["state"], "zip_code": "00000"}
+        req = urllib.request.Request(base + "/api/lookup-districts", data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    else:
+        query = urllib.parse.urlencode({"lat": point["lat"], "lon": point["lon"], "state": point["state"]})
+        req = urllib.request.Request(f"{base}/api/lookup-districts?{query}")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+            status, timing = resp.status, resp.headers.get("Server-Timing", "")
+    except urllib.error.HTTPError as e:
+        e.read()
+        status, timing = e.code, e.headers.get("Server-Timing", "")
+    ms = (time.perf_counter() - t0) * 1000
+    stages = {}
+    for part in filter(None, (p.strip() for p in timing.split(","))):
+        name, _, dur = part.partition(";dur=")
+        stages[name] = float(dur or 0)
+    return status, ms, stages
+
+
+def cold_probe(args):
+    """Child process: import the handler, serve two lookups, report."""
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):   # the handler's per-request log lines
+        base = load_handler(args.districts_dir)
+        import_ms = (time.perf_counter() - t0) * 1000
+        point = {"state": args.probe_state}
+        first = request(base, args.probe_index, point)
+        second = request(base, args.probe_index, point)
+    print(json.dumps({
+        "import_ms": round(import_ms, 3),
+        "first_ms": round(first[1], 3),
+        "second_ms": round(second[1], 3),
+        "first_status": first[0],
+        "first_stages": first[2],
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def run_cold(args, points, stub_url):
+    runs = []
+    for k in range(args.cold_runs):
+        i = k % len(points)
+        cmd = [sys.executable, os.path.abspath(__file__), "--cold-probe", "--probe-index", str(i),
+               "--probe-state", points[i]["state"]]
+        if args.districts_dir:
+            cmd += ["--districts-dir", args.districts_dir]
+        if args.cache:
+            cmd.append("--cache")
+        t0 = time.perf_counter()
+        out = subprocess.run(cmd, capture_output=True, text=True, env={**os.environ, "NOMINATIM_URL": stub_url})
+        if out.returncode:
+            raise SystemExit(f"cold probe failed:\n{out.stderr}")
+        runs.append({**json.loads(out.stdout.strip().splitlines()[-1]),
+                     "process_ms": round((time.perf_counter() - t0) * 1000, 3)})
+    return {
+        "runs": runs,
+        "import_ms": summary([r["import_ms"] for r in runs]),
+        "first_ms": summary([r["first_ms"] for r in runs]),
+        "process_ms": summary([r["process_ms"] for r in runs]),
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in runs), default=None),
+    }
+
+
+def run_warm(base, points, method):
+    ms, errors, stages = [], 0, {}
+    for i, point in enumerate(points):
+        status, t, st = request(base, i, point, method)
+        ms.append(t)
+        errors += status != 200
+        for name, dur in st.items():
+            stages.setdefault(name, []).append(dur)
+    return {**summary(ms), "errors": errors, "stages_p50_ms": {k: pct(v, 50) for k, v in stages.items()}}
+
+
+def run_throughput(base, points, concurrency, total):
+    def one(i):
+        return request(base, i, points[i % len(points)])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        t0 = time.perf_counter()
+        results = list(pool.map(one, range(total)))
+        elapsed = time.perf_counter() - t0
+    ms = [r[1] for r in results]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(1 for r in results if r[0] != 200),
+        "rps": round(total / elapsed, 1),
+        "latency_ms": summary(ms),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    import lookup_corpus
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    lookup_corpus.add_arguments(ap)
+    ap.add_argument("--geocode-latency-ms", type=float, default=80.0, help="stub Nominatim delay (default 80)")
+    ap.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 16])
+    ap.add_argument("--requests", type=int, default=0, help="requests per concurrency level (default: corpus size)")
+    ap.add_argument("--cold-runs", type=int, default=3)
+    ap.add_argument("--cache", action="store_true", help="leave the geocode cache on")
+    ap.add_argument("--districts-dir", help="benchmark against another districts/ data tree")
+    ap.add_argument("--out", help="write results here instead of stdout")
+    ap.add_argument("--cold-probe", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--probe-index", type=int, default=0, help=argparse.SUPPRESS)
+    ap.add_argument("--probe-state", default="GA", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.cold_probe:
+        configure_env(os.environ["NOMINATIM_URL"], args.cache)
+        return cold_probe(args)
+
+    if args.districts_dir:
+        import find_district
+        find_district.DISTRICTS_DIR = args.districts_dir
+    points = lookup_corpus.from_args(args)
+    if not points:
+        raise SystemExit("empty corpus: no layers on disk for " + ", ".join(args.states))
+    stub = start_stub(points, args.geocode_latency_ms)
+    stub_url = f"http://127.0.0.1:{stub.server_port}/search"
+    configure_env(stub_url, args.cache)
+
+    print(f"corpus: {len(points)} points; cold runs...", file=sys.stderr)
+    cold = run_cold(args, points, stub_url)
+    with contextlib.redirect_stdout(io.StringIO()):
+        base = load_handler(args.districts_dir)
+        request(base, 0, points[0])   # load the layers before timing anything
+        print("warm...", file=sys.stderr)
+        warm = {"post": run_warm(base, points, "POST"), "get": run_warm(base, points, "GET")}
+        throughput = []
+        for c in args.concurrency:
+            print(f"throughput x{c}...", file=sys.stderr)
+            throughput.append(run_throughput(base, points, c, args.requests or len(points)))
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "corpus": {"points": len(points), "fingerprint": lookup_corpus.fingerprint(points),
+                       "states": args.states, "seed": args.seed},
+            "geocode_latency_ms": args.geocode_latency_ms,
+            "geocode_cache": args.cache,
+        },
+        "cold": cold,
+        "warm": warm,
+        "throughput": throughput,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"-> {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()